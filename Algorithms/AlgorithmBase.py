@@ -1,7 +1,13 @@
+import functools
+import math
+import threading
 import time
 
 from abc import ABC, abstractmethod
 from dataclasses import dataclass
+from typing import Callable
+
+from Algorithms.GameState import GameState
 
 
 @dataclass
@@ -10,14 +16,163 @@ class Move:
     items_to_remove: int
 
 
+@dataclass
+class SearchStats:
+    """What an algorithm did to compute a single move. Counters an algorithm has no use for stay at 0."""
+    nodes: int = 0
+    leaf_evals: int = 0
+    tt_hits: int = 0
+    cutoffs: int = 0
+    first_move_cutoffs: int = 0
+    max_depth: int = 0
+    iterations: int = 0
+    rollouts: int = 0
+    # Positions whose result was looked up in an endgame tablebase
+    tablebase_hits: int = 0
+    # Positions whose proven result was found in a persistent position cache
+    cache_hits: int = 0
+    # 1 if the move was searched from a position the algorithm pondered on
+    ponder_hits: int = 0
+    # Bytes taken by the search tree at its largest
+    peak_memory: int = 0
+    # Nodes freed to make room for new ones when the search tree was full
+    recycled_nodes: int = 0
+    wall_time: float = 0.0
+    # CPU time of the thread that computed the move - work done in other processes is not included
+    cpu_time: float = 0.0
+    # How far past the deadline a timed move was returned
+    overshoot: float = 0.0
+
+    @property
+    def cutoff_rate(self) -> float:
+        """Fraction of searched nodes that ended with a cutoff"""
+        return self.cutoffs / self.nodes if self.nodes else 0.0
+
+    @property
+    def first_move_cutoff_rate(self) -> float:
+        """Fraction of cutoffs caused by the first move tried - close to 1 means close to the minimal tree"""
+        return self.first_move_cutoffs / self.cutoffs if self.cutoffs else 0.0
+
+    @property
+    def nodes_per_second(self) -> float:
+        return self.nodes / self.wall_time if self.wall_time > 0 else 0.0
+
+    @property
+    def rollouts_per_second(self) -> float:
+        return self.rollouts / self.wall_time if self.wall_time > 0 else 0.0
+
+
+def measured(method):
+    """
+    Decorator of get_move and get_move_timed - the outermost call starts new `stats`, measures its time
+    and passes the stats to `stats_callback`. Nested calls (like get_move inside get_move_timed) add to the same stats.
+    Stacks given as a list are turned into a GameState, so the algorithms always get one.
+    """
+    @functools.wraps(method)
+    def wrapper(self: 'AlgorithmBase', stacks: GameState | list[int], limit):
+        if not isinstance(stacks, GameState):
+            stacks = GameState(stacks)
+        if self._measuring:
+            return method(self, stacks, limit)
+
+        self._measuring = True
+        self.stats = SearchStats()
+        start_time = time.perf_counter()
+        start_cpu_time = time.thread_time()
+        self._search_start = start_time
+        self._next_progress = start_time + self.PROGRESS_INTERVAL
+        self._best_move = None
+        self._searched_depth = 0
+        try:
+            self._poll(start_time)
+            move = method(self, stacks, limit)
+        finally:
+            self.stats.wall_time = time.perf_counter() - start_time
+            self.stats.cpu_time = time.thread_time() - start_cpu_time
+            self._measuring = False
+
+        if self.stats_callback is not None:
+            self.stats_callback(self.stats)
+        return move
+
+    return wrapper
+
+
+class SearchTimeout(Exception):
+    """Raised from inside a search when the deadline of a timed move has passed"""
+
+
+class SearchCancelled(Exception):
+    """Raised from inside a search when its cancellation token was cancelled - there is no move to return"""
+
+
+class CancellationToken:
+    """Lets other threads (or processes, given a multiprocessing event) stop a running search"""
+
+    def __init__(self, event=None):
+        self._event = event if event is not None else threading.Event()
+
+    def cancel(self) -> None:
+        self._event.set()
+
+    def reset(self) -> None:
+        self._event.clear()
+
+    def is_cancelled(self) -> bool:
+        return self._event.is_set()
+
+
+@dataclass
+class SearchProgress:
+    """Snapshot of a running search, passed to progress_callback"""
+    best_move: Move | None
+    depth: int
+    nodes: int
+    iterations: int
+    rollouts: int
+    elapsed: float
+
+
 class AlgorithmBase(ABC):
+    # How many calls to _check_deadline happen between two reads of the clock
+    DEADLINE_POLL_INTERVAL: int = 256
+
+    # Seconds between two calls of progress_callback
+    PROGRESS_INTERVAL: float = 0.1
+
+    def __init__(self):
+        self._deadline: float = math.inf
+        self._polls_until_clock: int = self.DEADLINE_POLL_INTERVAL
+
+        # Checked together with the deadline - searches raise SearchCancelled soon after it is cancelled
+        self.cancellation_token: CancellationToken | None = None
+        # Called from the searching thread every PROGRESS_INTERVAL seconds of a search
+        self.progress_callback: Callable[[SearchProgress], None] | None = None
+        self._search_start: float = 0.0
+        self._next_progress: float = math.inf
+        # Best move of the running search so far, in indices of the searched stacks
+        self._best_move: Move | None = None
+        # Depth the running search is trying to complete, if it searches by depth
+        self._searched_depth: int = 0
+
+        self.stats: SearchStats = SearchStats()
+        self.stats_callback: Callable[[SearchStats], None] | None = None
+        self._measuring: bool = False
+
+        # Work done while pondering, and the position it was done for
+        self.ponder_stats: SearchStats = SearchStats()
+        self._ponder_thread: threading.Thread | None = None
+        self._ponder_position: GameState | None = None
+        self._pondering: bool = False
+
     @abstractmethod
-    def get_move(self, stacks: list[int], depth: int) -> Move:
+    def get_move(self, stacks: GameState, depth: int) -> Move:
         """
-        Get next move for the current state of Nim Misère
+        Get next move for the current state of Nim Misère.
+        Implementations should be decorated with @measured and fill in `stats`.
         
         Args:
-            state: List of integers representing the number of items in each stack
+            stacks: number of items in each stack - a plain list is accepted too
             depth: Search depth for algorithms that use it - ignored otherwise
         """
         pass
@@ -31,23 +186,161 @@ class AlgorithmBase(ABC):
     def _uses_depth(self) -> bool:
         pass
     
-    def get_move_timed(self, stacks: list[int], time_for_move: float) -> Move:
+    def close(self) -> None:
+        """Release resources held by the algorithm, like worker processes"""
+        pass
+
+    def can_ponder(self) -> bool:
+        """Whether searching on the opponent's time helps the next move"""
+        return self._uses_depth()
+
+    def start_pondering(self, stacks: GameState) -> None:
+        """
+        Start searching in a background thread while the opponent thinks about the given position.
+        The search runs until stop_pondering() and leaves its results (transposition table, search tree)
+        for the next move.
+
+        Pondering runs in a thread of the same process, so with the GIL it takes CPU time from the opponent's
+        search - it only adds thinking time where threads run in parallel (free-threaded Python)
+        or when the opponent does its work in other processes.
+        """
+        if not self.can_ponder() or self._ponder_thread is not None or stacks.is_terminal():
+            return
+
+        self._deadline = math.inf
+        self._polls_until_clock = self.DEADLINE_POLL_INTERVAL
+        self._ponder_thread = threading.Thread(target=self._run_ponder, args=(stacks,), daemon=True)
+        self._ponder_thread.start()
+
+    def stop_pondering(self) -> None:
+        if self._ponder_thread is None:
+            return
+
+        # The search sees the deadline as passed and aborts
+        self._deadline = -math.inf
+        self._ponder_thread.join()
+        self._ponder_thread = None
+        self._deadline = math.inf
+
+    def ponder_hit(self, stacks: GameState) -> bool:
+        """Whether the last pondering was done for the given position - the opponent played the predicted reply"""
+        return self._ponder_position is not None and self._ponder_position == stacks
+
+    def _run_ponder(self, stacks: GameState) -> None:
+        # Work of the nested get_move calls goes to ponder_stats, not to the stats of the last move
+        self._measuring = True
+        self._pondering = True
+        self.stats = self.ponder_stats = SearchStats()
+        start_time = time.perf_counter()
+        try:
+            self._ponder(stacks)
+        except (SearchTimeout, SearchCancelled):
+            pass
+        finally:
+            self.ponder_stats.wall_time = time.perf_counter() - start_time
+            self._measuring = False
+            self._pondering = False
+
+    def _ponder(self, stacks: GameState) -> None:
+        """
+        Search while the opponent is to move in the given position, until the deadline is set to the past.
+        By default it predicts the opponent's reply and searches the position after it.
+        """
+        move = self._predict_reply(stacks)
+        self._ponder_position = stacks.after(move.stack_index, move.items_to_remove)
+        if not self._ponder_position.is_terminal():
+            self._search_until_deadline(self._ponder_position)
+
+    def _predict_reply(self, stacks: GameState) -> Move:
+        """Most likely move of the opponent - the first legal move, unless an algorithm knows better"""
+        return Move(stack_index=stacks.non_zero_indices()[0], items_to_remove=1)
+
+    @measured
+    def get_move_timed(self, stacks: GameState, time_for_move: float) -> Move:
         """
         Get next move for the current state of Nim Misère with a time limit.
-        While there is time left, bigger depth will be tried.
+        While there is time left, bigger depth will be tried. A search that is still running
+        at the deadline is aborted and the move from the last completed depth is returned.
+        How far past the deadline the move was returned is stored in `stats.overshoot`.
         
         Args:
-            stacks: List of integers representing the number of items in each stack
+            stacks: number of items in each stack - a plain list is accepted too
             time_for_move: Time limit for the move
         """
         if not self._uses_depth():
             return self.get_move(stacks, 0)
-        
-        start_time = time.time()
-        
-        depth = 1
-        while time.time() - start_time < time_for_move:
-            move = self.get_move(stacks, depth)
-            depth += 1
+
+        self.stats.ponder_hits = int(self.ponder_hit(stacks))
+        self._ponder_position = None
+
+        self._deadline = time.perf_counter() + time_for_move
+        self._polls_until_clock = self.DEADLINE_POLL_INTERVAL
+        try:
+            move = self._search_until_deadline(stacks)
+        finally:
+            self.stats.overshoot = max(0.0, time.perf_counter() - self._deadline)
+            self._deadline = math.inf
 
         return move
+
+    def _search_until_deadline(self, stacks: GameState) -> Move:
+        """Iterative deepening - searches with growing depth until the deadline aborts one of them"""
+        move = None
+
+        # The game cannot last longer than the number of items left, so deeper searches change nothing
+        for depth in range(1, stacks.total + 1):
+            try:
+                move = self.get_move(stacks, depth)
+            except SearchTimeout:
+                break
+            self._best_move = move
+
+        if move is None:
+            # Not even the first depth was completed - any legal move will do
+            move = Move(stack_index=stacks.non_zero_indices()[0], items_to_remove=1)
+
+        return move
+
+    def _deadline_passed(self) -> bool:
+        """
+        Raises:
+            SearchCancelled: if the cancellation token was cancelled
+        """
+        now = time.perf_counter()
+        self._poll(now)
+        return now > self._deadline
+
+    def _poll(self, now: float) -> None:
+        """Check the cancellation token and publish the progress when it is time to"""
+        if self.cancellation_token is not None and self.cancellation_token.is_cancelled():
+            raise SearchCancelled()
+
+        if self.progress_callback is not None and now >= self._next_progress and not self._pondering:
+            self._next_progress = now + self.PROGRESS_INTERVAL
+            self.progress_callback(SearchProgress(
+                best_move=self._current_best_move(),
+                depth=max(self.stats.max_depth, self._searched_depth),
+                nodes=self.stats.nodes,
+                iterations=self.stats.iterations,
+                rollouts=self.stats.rollouts,
+                elapsed=now - self._search_start))
+
+    def _current_best_move(self) -> Move | None:
+        return self._best_move
+
+    def _check_deadline(self) -> None:
+        """
+        Cheap deadline check for the hot loops of searches - the clock is read only every few calls.
+        The cancellation token and progress are checked at the same time.
+        
+        Raises:
+            SearchTimeout: if the deadline of the current timed move has passed
+            SearchCancelled: if the cancellation token was cancelled
+        """
+        self._polls_until_clock -= 1
+        if self._polls_until_clock > 0:
+            return
+
+        self._polls_until_clock = self.DEADLINE_POLL_INTERVAL
+        if self._deadline_passed():
+            raise SearchTimeout()
@@ -1,68 +1,186 @@
 import math
-from Algorithms.AlgorithmBase import AlgorithmBase, Move
 
+from Algorithms.AlgorithmBase import AlgorithmBase, Move, measured
+from Algorithms.GameState import GameState
+from Algorithms.MoveOrdering import HeuristicMoveOrdering, MoveOrdering
+from Algorithms.PositionCache import PositionCache
+from Algorithms.Tablebase import Tablebase
+from Algorithms.TranspositionTable import Bound, TranspositionTable, TTEntry
 
-class AlphaBetaAlgorithm(AlgorithmBase):        
-    def get_move(self, stacks: list[int], depth: int) -> Move:
-        non_zero_indices = [i for i, stack in enumerate(stacks) if stack > 0]
-        non_zero_stacks = [stacks[i] for i in non_zero_indices]
 
-        chosen_move = self.alphabeta_move(non_zero_stacks, depth)
+class AlphaBetaAlgorithm(AlgorithmBase):
+    # Nodes closer to the leaves are cheaper to search than to look up in the position cache
+    POSITION_CACHE_MIN_DEPTH: int = 2
+
+    def __init__(self, tt_size: int = 1_000_000, move_ordering: MoveOrdering | None = None,
+                 tablebase: Tablebase | None = None, position_cache: PositionCache | None = None):
+        """
+        Args:
+            tt_size: limit of positions in the transposition table
+            move_ordering: order of moves to search, HeuristicMoveOrdering by default
+            tablebase: endgame tablebase - positions it covers are not searched
+            position_cache: persistent cache - proven results are looked up in it and added to it
+        """
+        super().__init__()
+        self.transposition_table: TranspositionTable = TranspositionTable(tt_size)
+        self.move_ordering: MoveOrdering = move_ordering if move_ordering is not None else HeuristicMoveOrdering()
+        self.tablebase: Tablebase | None = tablebase
+        self.position_cache: PositionCache | None = position_cache
+        # Best root move of the previous search, as (stack height, items to remove)
+        self.pv_move: tuple[int, int] | None = None
+        # Best root move of the running search so far, and the game stack indices of the searched root
+        self._root_best: Move | None = None
+        self._root_indices: list[int] = []
+
+    @measured
+    def get_move(self, stacks: GameState, depth: int) -> Move:
+        non_zero_indices = stacks.non_zero_indices()
+        self._root_indices = non_zero_indices
+        self._searched_depth = depth
+
+        try:
+            chosen_move = self.alphabeta_move(GameState(stacks.non_zero_stacks()), depth)
+        finally:
+            if self.position_cache is not None:
+                self.position_cache.flush()
+        self.stats.iterations += 1
+        self.stats.max_depth = max(self.stats.max_depth, depth)
         return Move(stack_index=non_zero_indices[chosen_move.stack_index], items_to_remove=chosen_move.items_to_remove)
-    
+
     def _uses_depth(self) -> bool:
         return True
-    
+
     @classmethod
     def get_name(cls) -> str:
         return "AlphaBeta"
 
-    def alphabeta_move(self, stacks: list[int], depth: int) -> Move:
+    def _predict_reply(self, stacks: GameState) -> Move:
+        # Best move found for the position by the last search, or the best guess of the move ordering
+        entry = self.transposition_table.probe(stacks.hash)
+        stack, items = self.move_ordering.order_moves(stacks, 0, entry.move if entry is not None else None)[0]
+        return Move(stack_index=stack, items_to_remove=items)
+
+    def alphabeta_move(self, stacks: GameState, depth: int) -> Move:
+        if self.tablebase is not None:
+            result = self.tablebase.probe(stacks)
+            if result is not None:
+                self.stats.tablebase_hits += 1
+                chosen_move = result[1]
+                self.pv_move = (stacks[chosen_move.stack_index], chosen_move.items_to_remove)
+                return chosen_move
+
+        if self.position_cache is not None:
+            cached = self.position_cache.get(stacks)
+            if cached is not None and cached.move is not None and cached.move[0] in stacks:
+                self.stats.cache_hits += 1
+                self.pv_move = cached.move
+                return Move(stack_index=stacks.index(cached.move[0]), items_to_remove=cached.move[1])
+
+        self.move_ordering.new_search()
+
         best_value = -math.inf
         chosen_move = Move(stack_index=0, items_to_remove=1)
-                
-        for stack in range(len(stacks)):
-            for i in range(1, stacks[stack]+1):  
-                stacks[stack] = stacks[stack] - i
-                value = self.alphabeta_search(stacks, depth, -math.inf, math.inf, -1)
-                stacks[stack] = stacks[stack] + i
-                
-                if best_value <= value:
-                    best_value = value
-                    chosen_move = Move(stack_index=stack, items_to_remove=i)
-                    
+        self._root_best = None
+
+        for stack, i in self.move_ordering.order_moves(stacks, 0, self.pv_move):
+            value = -self.alphabeta_search(stacks.after(stack, i), depth, -1, -max(best_value, -1), 1)
+
+            if best_value < value:
+                best_value = value
+                chosen_move = Move(stack_index=stack, items_to_remove=i)
+                self._root_best = chosen_move
+
+                if best_value == 1:
+                    break
+
+        self.pv_move = (stacks[chosen_move.stack_index], chosen_move.items_to_remove)
+        if self.position_cache is not None and best_value != 0:
+            self.position_cache.put(stacks, best_value, depth, self.pv_move)
         return chosen_move
-        
-    def alphabeta_search(self, stacks: list[int], depth: int, alpha: int, beta: int, our_turn: bool) -> int:
-        if len(stacks) == 0:
-            return 1 if our_turn else -1
+
+    def _current_best_move(self) -> Move | None:
+        if self._root_best is None:
+            # Nothing searched at this depth yet, the move of the previous depth is the best known
+            return self._best_move
+        return Move(stack_index=self._root_indices[self._root_best.stack_index],
+                    items_to_remove=self._root_best.items_to_remove)
+
+    def alphabeta_search(self, stacks: GameState, depth: int, alpha: int, beta: int, ply: int) -> int:
+        """
+        Negamax search with alpha-beta pruning and a transposition table keyed on the state hash
+
+        Returns:
+            1 if the player to move wins, -1 if they lose, 0 if it is unknown within the given depth
+        """
+        if stacks.is_terminal():
+            # The opponent took the last item
+            self.stats.leaf_evals += 1
+            return 1
+
+        if self.tablebase is not None:
+            win = self.tablebase.probe_win(stacks)
+            if win is not None:
+                self.stats.tablebase_hits += 1
+                return 1 if win else -1
 
         if depth == 0:
+            self.stats.leaf_evals += 1
             return 0
 
-        if not our_turn:
-            for stack in range(len(stacks)):
-                for i in range(1, stacks[stack]+1):  
-                    stacks[stack] = stacks[stack] - i
-                    beta = min(beta, self.alphabeta_search(stacks, depth-1, alpha, beta, 1))
-                    stacks[stack] = stacks[stack] + i
-                    
-                    if alpha >= beta or alpha == 1:
-                        break
-                    
-                if alpha >= beta or alpha == 1:
-                        break
-            return beta
+        self._check_deadline()
+        self.stats.nodes += 1
+
+        key = stacks.hash
+        entry = self.transposition_table.probe(key)
+        hash_move = None
+        if entry is not None:
+            hash_move = entry.move
+            if entry.depth >= depth or entry.is_proven():
+                self.stats.tt_hits += 1
+                if entry.bound == Bound.EXACT:
+                    return entry.value
+                if entry.bound == Bound.LOWER:
+                    alpha = max(alpha, entry.value)
+                else:
+                    beta = min(beta, entry.value)
+                if alpha >= beta:
+                    return entry.value
+        elif self.position_cache is not None and depth >= self.POSITION_CACHE_MIN_DEPTH:
+            cached = self.position_cache.get(stacks)
+            if cached is not None:
+                self.stats.cache_hits += 1
+                self.transposition_table.store(key, cached.value, depth, Bound.EXACT, cached.move)
+                return cached.value
+
+        original_alpha = alpha
+        best_value = -1
+        best_move = None
+        for move_number, (stack, i) in enumerate(self.move_ordering.order_moves(stacks, ply, hash_move)):
+            value = -self.alphabeta_search(stacks.after(stack, i), depth-1, -beta, -alpha, ply+1)
+
+            if best_move is None or value > best_value:
+                best_value = value
+                best_move = (stacks[stack], i)
+
+            alpha = max(alpha, value)
+            if alpha >= beta:
+                self.stats.cutoffs += 1
+                if move_number == 0:
+                    self.stats.first_move_cutoffs += 1
+                self.move_ordering.record_cutoff(stacks, (stack, i), ply, depth)
+                break
+
+        if best_value <= original_alpha:
+            # No move raised alpha, so none of them is known to be better than the others
+            bound = Bound.UPPER
+            best_move = hash_move
+        elif best_value >= beta:
+            bound = Bound.LOWER
         else:
-            for stack in range(len(stacks)):
-                for i in range(1, stacks[stack]+1):  
-                    stacks[stack] = stacks[stack] - i
-                    alpha = max(alpha, self.alphabeta_search(stacks, depth-1, alpha, beta, -1))
-                    stacks[stack] = stacks[stack] + i
-                    
-                    if alpha >= beta or beta == -1:
-                        break
-                    
-                if alpha >= beta or beta == -1:
-                        break
-            return alpha
+            bound = Bound.EXACT
+        self.transposition_table.store(key, best_value, depth, bound, best_move)
+        if self.position_cache is not None and depth >= self.POSITION_CACHE_MIN_DEPTH \
+                and TTEntry(best_value, depth, bound).is_proven():
+            self.position_cache.put(stacks, best_value, depth, best_move)
+
+        return best_value
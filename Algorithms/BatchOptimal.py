@@ -0,0 +1,103 @@
+from dataclasses import dataclass
+from typing import Iterator
+
+import numpy as np
+
+
+@dataclass
+class BatchSolution:
+    """Result of every position (row) of a batch"""
+    # True if the player to move wins with optimal play
+    wins: np.ndarray
+    # Column of the stack to take from, -1 for positions with no items left
+    stack_indices: np.ndarray
+    # Items to take, 0 for positions with no items left
+    items_to_remove: np.ndarray
+
+
+def solve_positions(positions: np.ndarray) -> BatchSolution:
+    """
+    Solve many positions at once, as NumPy array operations.
+    Every won row gets a winning move, so the batch can be used as ground truth. It is the move of
+    Optimal.get_move, except for rows where the only winning move is on a stack of 1 (e.g. [2, 2, 1]) -
+    Optimal skips those stacks and plays a losing move.
+
+    Args:
+        positions: 2-D integer array, one position per row, padded with zeros
+
+    Returns:
+        Win/loss of the player to move and the optimal move of every row
+    """
+    positions = np.asarray(positions)
+    if positions.ndim != 2:
+        raise ValueError(f"Expected a 2-D array of positions, got {positions.ndim} dimensions")
+    if not np.issubdtype(positions.dtype, np.integer):
+        raise ValueError(f"Expected an integer array of positions, got {positions.dtype}")
+
+    rows = positions.shape[0]
+    if positions.shape[1] == 0:
+        return BatchSolution(np.ones(rows, dtype=bool), np.full(rows, -1, dtype=np.int64),
+                             np.zeros(rows, dtype=np.int64))
+
+    row_indices = np.arange(rows)
+    non_zero = positions > 0
+    big = positions > 1
+    non_zero_counts = np.count_nonzero(non_zero, axis=1)
+    big_counts = np.count_nonzero(big, axis=1)
+    nim_sums = np.bitwise_xor.reduce(positions, axis=1)
+
+    # Only 1s left - the player to move wins with an even number of them, otherwise the nim-sum decides
+    wins = np.where(big_counts == 0, non_zero_counts % 2 == 0, nim_sums != 0)
+
+    # argmax returns the first maximum, like list.index(max(...)) does
+    first_non_zero = np.argmax(non_zero, axis=1)
+    max_columns = np.argmax(positions, axis=1)
+    max_stacks = positions[row_indices, max_columns].astype(np.int64)
+
+    # Endgame with a single stack above 1 - leave an odd number of 1s
+    stack_indices = np.where(big_counts == 0, first_non_zero, max_columns).astype(np.int64)
+    items_to_remove = np.where(big_counts == 1, max_stacks - non_zero_counts % 2, 1).astype(np.int64)
+
+    # Otherwise reduce the first stack above 1 that can be brought down to stack ^ nim_sum, like Optimal does.
+    # Without one, a stack of 1 is reduced - with at least two stacks above 1, one of them is left after the move,
+    # so reaching nim-sum 0 wins anyway. One of the stacks can always be reduced when the nim-sum is not 0.
+    targets = positions ^ nim_sums[:, None]
+    reducible = non_zero & (targets < positions)
+    big_candidates = big & reducible
+    candidates = np.where(big_candidates.any(axis=1)[:, None], big_candidates, reducible)
+    candidate_columns = np.argmax(candidates, axis=1)
+
+    winning = (big_counts >= 2) & (nim_sums != 0)
+    stack_indices[winning] = candidate_columns[winning]
+    items_to_remove[winning] = (positions[row_indices, candidate_columns]
+                                - targets[row_indices, candidate_columns])[winning]
+
+    empty = non_zero_counts == 0
+    stack_indices[empty] = -1
+    items_to_remove[empty] = 0
+
+    return BatchSolution(wins, stack_indices, items_to_remove)
+
+
+def solve_in_chunks(positions: np.ndarray, chunk_rows: int = 1_000_000) -> Iterator[tuple[int, BatchSolution]]:
+    """
+    Solve the positions a chunk of rows at a time, so only one chunk has to be in memory.
+    Works with memory-mapped arrays, see solve_file.
+
+    Args:
+        positions: 2-D integer array, one position per row, padded with zeros
+        chunk_rows: rows solved at once
+
+    Returns:
+        Index of the first row of every chunk and the solution of that chunk
+    """
+    for start in range(0, positions.shape[0], chunk_rows):
+        yield start, solve_positions(np.asarray(positions[start:start + chunk_rows]))
+
+
+def solve_file(path: str, chunk_rows: int = 1_000_000) -> Iterator[tuple[int, BatchSolution]]:
+    """
+    Solve positions stored in a .npy file that can be larger than the memory - the file is memory-mapped
+    and read one chunk at a time.
+    """
+    return solve_in_chunks(np.load(path, mmap_mode='r'), chunk_rows)
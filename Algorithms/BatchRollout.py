@@ -0,0 +1,39 @@
+import numpy as np
+
+
+def simulate_random_games(state: list[int], games: int, rng: np.random.Generator) -> int:
+    """
+    Play many uniformly random games from the same state at once, as NumPy array operations.
+    Every ply picks move number r of all (stack_index, items_to_remove) pairs of every unfinished game,
+    the same way as the scalar rollout does.
+
+    Args:
+        state: stack sizes
+        games: number of games to play
+        rng: source of random numbers
+
+    Returns:
+        Number of games won by the player to move in the given state
+    """
+    stacks = np.tile(np.asarray(state, dtype=np.int64), (games, 1))
+    totals = stacks.sum(axis=1)
+    plies = np.zeros(games, dtype=np.int64)
+
+    active = np.flatnonzero(totals > 0)
+    while active.size > 0:
+        active_stacks = stacks[active]
+        r = rng.integers(0, totals[active])
+
+        # The chosen stack is the first one whose running total exceeds r
+        running_totals = np.cumsum(active_stacks, axis=1)
+        stack_indices = np.argmax(running_totals > r[:, None], axis=1)
+        rows = np.arange(active.size)
+        items = r - (running_totals[rows, stack_indices] - active_stacks[rows, stack_indices]) + 1
+
+        stacks[active, stack_indices] -= items
+        totals[active] -= items
+        plies[active] += 1
+        active = active[totals[active] > 0]
+
+    # In Misère Nim, the player who takes the last item loses - after an even number of plies that is the opponent
+    return int(np.count_nonzero(plies % 2 == 0))
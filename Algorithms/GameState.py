@@ -0,0 +1,114 @@
+from collections.abc import Iterable, Iterator, Sequence
+
+HASH_MASK: int = (1 << 64) - 1
+
+
+def height_hash(height: int) -> int:
+    """
+    Pseudo-random 64-bit value of a stack height (splitmix64), 0 for an empty stack.
+    Heights of any size are folded to 64 bits first.
+    """
+    if height == 0:
+        return 0
+
+    x = height & HASH_MASK
+    height >>= 64
+    while height:
+        x = (x * 0x9E3779B97F4A7C15 ^ height & HASH_MASK) & HASH_MASK
+        height >>= 64
+
+    x = (x + 0x9E3779B97F4A7C15) & HASH_MASK
+    x = ((x ^ (x >> 30)) * 0xBF58476D1CE4E5B9) & HASH_MASK
+    x = ((x ^ (x >> 27)) * 0x94D049BB133111EB) & HASH_MASK
+    return x ^ (x >> 31)
+
+
+class GameState(Sequence):
+    """
+    Immutable stack sizes, with the values every algorithm keeps asking about maintained per move in O(1):
+    number of items left, non-empty stacks, stacks above 1 and the nim-sum.
+
+    `hash` is the sum of height_hash of all stacks (mod 2^64) - like a Zobrist hash, but of the multiset of heights,
+    so it is the same for every order of the stacks and for any number of empty stacks.
+    That makes it a ready key for tables of canonical positions.
+    """
+
+    __slots__ = ("_stacks", "total", "non_zero", "big_stacks", "nim_sum", "hash", "_non_zero_indices")
+
+    def __init__(self, stacks: Iterable[int]):
+        self._stacks: tuple[int, ...] = tuple(stacks)
+        self.total: int = 0
+        self.non_zero: int = 0
+        self.big_stacks: int = 0
+        self.nim_sum: int = 0
+        self.hash: int = 0
+        self._non_zero_indices: list[int] | None = None
+
+        for stack in self._stacks:
+            if stack < 0:
+                raise ValueError(f"Negative stack size: {stack}")
+            self.total += stack
+            self.non_zero += stack > 0
+            self.big_stacks += stack > 1
+            self.nim_sum ^= stack
+            self.hash = (self.hash + height_hash(stack)) & HASH_MASK
+
+    def after(self, stack_index: int, items_to_remove: int) -> 'GameState':
+        """State after the given move, only the stacks themselves are copied"""
+        old = self._stacks[stack_index]
+        if not 0 < items_to_remove <= old:
+            raise ValueError(f"Cannot remove {items_to_remove} items from stack {stack_index} of size {old}")
+        new = old - items_to_remove
+
+        state = GameState.__new__(GameState)
+        state._stacks = self._stacks[:stack_index] + (new,) + self._stacks[stack_index + 1:]
+        state.total = self.total - items_to_remove
+        state.non_zero = self.non_zero - (new == 0)
+        state.big_stacks = self.big_stacks - (old > 1 and new <= 1)
+        state.nim_sum = self.nim_sum ^ old ^ new
+        state.hash = (self.hash - height_hash(old) + height_hash(new)) & HASH_MASK
+        state._non_zero_indices = None
+        return state
+
+    def is_terminal(self) -> bool:
+        """No items left - the player to move wins, as the opponent took the last item"""
+        return self.total == 0
+
+    def non_zero_indices(self) -> list[int]:
+        """Indices of the non-empty stacks - computed once per state, do not modify"""
+        if self._non_zero_indices is None:
+            self._non_zero_indices = [i for i, stack in enumerate(self._stacks) if stack > 0]
+        return self._non_zero_indices
+
+    def non_zero_stacks(self) -> list[int]:
+        return [stack for stack in self._stacks if stack > 0]
+
+    def canonical(self) -> tuple[int, ...]:
+        """Sorted non-empty stacks - the same for all positions that are the same game"""
+        return tuple(sorted(self.non_zero_stacks()))
+
+    def __len__(self) -> int:
+        return len(self._stacks)
+
+    def __getitem__(self, index):
+        return self._stacks[index]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._stacks)
+
+    def index(self, value: int, start: int = 0, stop: int | None = None) -> int:
+        return self._stacks.index(value, start, len(self._stacks) if stop is None else stop)
+
+    def count(self, value: int) -> int:
+        return self._stacks.count(value)
+
+    def __eq__(self, other) -> bool:
+        if isinstance(other, GameState):
+            return self._stacks == other._stacks
+        return NotImplemented
+
+    def __hash__(self) -> int:
+        return hash(self._stacks)
+
+    def __repr__(self) -> str:
+        return f"GameState({list(self._stacks)})"
@@ -1,149 +1,309 @@
 import math
 import random
-from Algorithms.AlgorithmBase import AlgorithmBase, Move
-
-
-class Node:
-    def __init__(self, state: list[int], parent=None, action: tuple[int, int] | None = None):
-        self.state: list[int] = state
-        self.parent = parent
-        self.action: tuple[int, int] | None = action
-        self.children: list['Node'] = []
-        self.visits: int = 0
-        self.wins: int = 0
-        self.untried_actions: list[tuple[int, int]] = self.get_possible_actions()
-    
-    def get_possible_actions(self) -> list[tuple[int, int]]:
-        """Return list of possible actions as (stack_index, items_to_remove)"""
-        actions = []
-        for i, stack_size in enumerate(self.state):
-            for items in range(1, stack_size + 1):
-                actions.append((i, items))
-        return actions
-    
-    def add_child(self, action: tuple[int, int]) -> 'Node':
-        """Add a child node with the given action"""
-        # Create new state by applying action
-        new_state = self.state.copy()
-        stack_idx, items = action
-        new_state[stack_idx] -= items
-        
-        # Create child node
-        child = Node(new_state, parent=self, action=action)
-        self.untried_actions.remove(action)
-        self.children.append(child)
-        return child
-    
-    def ucb_score(self, exploration_weight: float = 1.0) -> float:
-        """Calculate UCB score for node selection"""
-        if self.visits == 0:
-            return float('inf')
-        
-        # Exploitation component
-        exploitation = self.wins / self.visits
-        
-        # Exploration component
-        exploration = exploration_weight * math.sqrt(math.log(self.parent.visits) / self.visits)
-        
-        return exploitation + exploration
-    
-    def is_terminal(self) -> bool:
-        return sum(self.state) == 0
+import sys
+
+import numpy as np
+
+from Algorithms.AlgorithmBase import AlgorithmBase, Move, measured
+from Algorithms.BatchRollout import simulate_random_games
+from Algorithms.GameState import GameState
+from Algorithms.MctsTree import MctsTree
+from Algorithms.Rollout import simulate_random_game
+from Algorithms.Tablebase import Tablebase
+
+
+class MctsAlgorithm(AlgorithmBase):
+    # Progressive widening - a node with more than WIDENING_MIN_ACTIONS actions gets a new child only while it has
+    # fewer than WIDENING_CONSTANT * (visits + 1) ** WIDENING_EXPONENT children
+    WIDENING_MIN_ACTIONS: int = 32
+    WIDENING_CONSTANT: float = 2.0
+    WIDENING_EXPONENT: float = 0.5
+
+    def __init__(self, max_nodes: int = 4_000_000, reuse_tree: bool = True, rollouts_per_leaf: int = 1,
+                 tablebase: Tablebase | None = None, max_memory: int | None = None, progressive_widening: bool = True):
+        """
+        Args:
+            max_nodes: limit of nodes in the search tree - when it is reached, the coldest subtrees are recycled
+            reuse_tree: keep the tree between moves and continue from the part of it that was actually played
+            rollouts_per_leaf: random games played from every selected leaf - more than one are played
+                as a single vectorized batch
+            tablebase: endgame tablebase - leaves it covers get their exact result instead of random games
+            max_memory: limit of the search tree in bytes, lowers max_nodes to fit in it
+            progressive_widening: add children of nodes with many actions (tall stacks) as their visits grow,
+                instead of trying every action before going deeper
+        """
+        super().__init__()
+        self.max_nodes: int = max_nodes if max_memory is None else min(max_nodes, max_memory // MctsTree.NODE_BYTES)
+        self.reuse_tree: bool = reuse_tree
+        self.rollouts_per_leaf: int = rollouts_per_leaf
+        self.tablebase: Tablebase | None = tablebase
+        self.progressive_widening: bool = progressive_widening
 
+        # Tree of the previous move, indices of the game stacks it was built on, and the move that was chosen
+        self._tree: MctsTree | None = None
+        self._tree_indices: list[int] = []
+        self._stacks_count: int = 0
+        # None if the tree was grown while pondering, with the position after our move as the root
+        self._chosen_action: tuple[int, int] | None = (0, 0)
+        # Tree of the running search, for progress reports
+        self._search_tree: MctsTree | None = None
 
-class MctsAlgorithm(AlgorithmBase):        
-    def get_move(self, stacks: list[int], depth: int) -> Move:
+    @measured
+    def get_move(self, stacks: GameState, depth: int) -> Move:
         """Implement the abstract method from AlgorithmBase"""
-        non_zero_indices = [i for i, stack in enumerate(stacks) if stack > 0]
-        non_zero_stacks = [stacks[i] for i in non_zero_indices]
+        tree = self._reuse_tree(stacks)
+        if tree is None:
+            self._tree_indices = stacks.non_zero_indices()
+            tree = MctsTree(stacks.non_zero_stacks(), self.max_nodes)
         
-        stack_idx, items = self.nim_misere_mcts(non_zero_stacks, depth)
-        return Move(stack_index=non_zero_indices[stack_idx], items_to_remove=items)
-    
+        stack_idx, items = self.nim_misere_mcts(tree.root_state, depth, tree)
+
+        if self.reuse_tree:
+            self._tree = tree
+            self._stacks_count = len(stacks)
+            self._chosen_action = (stack_idx, items)
+
+        return Move(stack_index=self._tree_indices[stack_idx], items_to_remove=items)
+
+    def _reuse_tree(self, stacks: GameState) -> MctsTree | None:
+        """
+        Find the position after our previous move and the opponent's reply in the previous tree.
+        The tree keeps the stack indices it was built on - stacks emptied since then stay in it as zeros.
+
+        Returns:
+            Subtree of that position, or None if it cannot be found
+        """
+        tree, self._tree = self._tree, None
+        found = self._find_reply(tree, stacks)
+        if found is None:
+            return None
+
+        node, state = found
+        return tree.extract_subtree(node, state)
+
+    def _find_reply(self, tree: MctsTree | None, stacks: GameState) -> tuple[int, list[int]] | None:
+        """
+        Returns:
+            Node of the given position in the tree of the previous move and its state, or None if it is not there
+        """
+        if tree is None or len(stacks) != self._stacks_count:
+            return None
+
+        state = [stacks[i] for i in self._tree_indices]
+        if sum(state) != stacks.total:
+            # Stacks the tree does not know about are not empty - this is some other game
+            return None
+
+        if self._chosen_action is None:
+            # Tree grown while pondering - its root is the position after our move already
+            our_child = tree.root
+            state_after_our_move = tree.root_state
+        else:
+            our_child = next((c for c in tree.children(tree.root) if tree.get_action(c) == self._chosen_action), None)
+            if our_child is None:
+                return None
+
+            state_after_our_move = tree.root_state.copy()
+            state_after_our_move[self._chosen_action[0]] -= self._chosen_action[1]
+
+        changed = [i for i in range(len(state)) if state[i] != state_after_our_move[i]]
+        if len(changed) != 1 or state[changed[0]] > state_after_our_move[changed[0]]:
+            return None
+
+        opponent_action = (changed[0], state_after_our_move[changed[0]] - state[changed[0]])
+        grandchild = next((c for c in tree.children(our_child) if tree.get_action(c) == opponent_action), None)
+        if grandchild is None:
+            return None
+
+        return grandchild, state
+
+    def ponder_hit(self, stacks: GameState) -> bool:
+        # Pondering grows the tree for all replies, it is a hit if the reply that was played is in it
+        return self._chosen_action is None and self._find_reply(self._tree, stacks) is not None
+
+    def _ponder(self, stacks: GameState) -> None:
+        """Keep growing the subtree of the move we played, so the opponent's reply is likely searched already"""
+        tree = self._tree
+        our_child = None
+        if tree is not None and self._chosen_action is not None and len(stacks) == self._stacks_count:
+            our_child = next((c for c in tree.children(tree.root) if tree.get_action(c) == self._chosen_action), None)
+
+        state = [stacks[i] for i in self._tree_indices] if our_child is not None else []
+        if our_child is not None and sum(state) == stacks.total:
+            tree = tree.extract_subtree(our_child, state)
+        else:
+            self._tree_indices = stacks.non_zero_indices()
+            tree = MctsTree(stacks.non_zero_stacks(), self.max_nodes)
+
+        self._tree = tree
+        self._stacks_count = len(stacks)
+        self._chosen_action = None
+        self.nim_misere_mcts(tree.root_state, sys.maxsize, tree)
+
     def _uses_depth(self) -> bool:
         return True
     
     @classmethod
     def get_name(cls) -> str:
         return "MCTS"
+
+    def _search_until_deadline(self, stacks: GameState) -> Move:
+        # The tree keeps growing until the deadline, so there is no need to restart with more iterations
+        return self.get_move(stacks, sys.maxsize)
     
-    def nim_misere_mcts(self, state: list[int], iterations: int) -> tuple[int, int]:
-        root = Node(state)
+    def nim_misere_mcts(self, state: list[int], iterations: int, tree: MctsTree | None = None) -> tuple[int, int]:
+        """
+        Args:
+            state: stacks to search from
+            iterations: number of MCTS iterations
+            tree: already built tree for the state, to continue searching in
+        """
+        if tree is None:
+            tree = MctsTree(state, self.max_nodes)
+
+        self._search_tree = tree
+        # Seeded from random, so that seeding it still makes the search reproducible
+        rng = np.random.default_rng(random.getrandbits(64)) if self.rollouts_per_leaf > 1 else None
         
         for _ in range(iterations):
-            node = self.select_node(root)
-            winner = self.simulate_random_game(node.state)
-            self.backpropagate(node, winner)
+            if self._deadline_passed():
+                break
 
-        if not root.children:
+            self._recycle_if_full(tree)
+            self.stats.iterations += 1
+            node_state = state.copy()
+            node = self.select_node(tree, node_state)
+            win = self.tablebase.probe_win(node_state) if self.tablebase is not None else None
+            if win is not None:
+                # Counts as many games as a rollout would, all of them won by the same player
+                self.stats.tablebase_hits += 1
+                self.backpropagate_many(tree, node, self.rollouts_per_leaf, self.rollouts_per_leaf if win else 0)
+            elif rng is not None:
+                wins = self.simulate_random_games(node_state, self.rollouts_per_leaf, rng)
+                self.backpropagate_many(tree, node, self.rollouts_per_leaf, wins)
+            else:
+                winner = self.simulate_random_game(node_state)
+                self.backpropagate(tree, node, winner)
+
+        self.stats.peak_memory = max(self.stats.peak_memory, tree.memory())
+        if tree.first_child[tree.root] == MctsTree.NO_NODE:
             # If no children (should not happen in a valid game), pick a random move
-            possible_actions = root.get_possible_actions()
-            if possible_actions:
-                return random.choice(possible_actions)
-            return (0, 1)  # Fallback
+            return MctsTree.action_from_ordinal(state, random.randrange(sum(state)))
         
         # Find child with highest win rate
-        best_child = max(root.children, key=lambda c: c.visits)
-        return best_child.action
+        best_child = max(tree.children(tree.root), key=lambda c: tree.visits[c])
+        return tree.get_action(best_child)
 
-    def select_node(self, node: Node) -> Node:
-        """Select a node to expand using UCB"""
-        current = node
+    def _recycle_if_full(self, tree: MctsTree) -> None:
+        if tree.is_full():
+            self.stats.recycled_nodes += tree.recycle()
+
+    def select_node(self, tree: MctsTree, state: list[int]) -> int:
+        """
+        Select a node to expand using UCB
+
+        Args:
+            tree: searched tree
+            state: state of the root - updated in place to the state of the selected node
+        """
+        current = tree.root
+        depth = 0
         
-        # Navigate down the tree until we reach a leaf node or a node with untried actions
-        while len(current.untried_actions) == 0 and len(current.children) > 0 and not current.is_terminal():
+        # Navigate down the tree until we reach a leaf node or a node that can get another child
+        while not self._can_expand(tree.action_count[current], tree.expanded[current], tree.visits[current]) \
+                and not tree.is_terminal(current):
             # Select child with highest UCB score
-            current = max(current.children, key=lambda c: c.ucb_score())
+            current = max(tree.children(current), key=lambda c: self.ucb_score(tree, c))
+            state[tree.action_stack[current]] -= tree.action_items[current]
+            depth += 1
         
-        # If we have untried actions, randomly select one and add a child
-        if len(current.untried_actions) > 0 and not current.is_terminal():
-            action = random.choice(current.untried_actions)
-            current = current.add_child(action)
+        # If we have untried actions, add the next one as a child
+        if self._can_expand(tree.action_count[current], tree.expanded[current], tree.visits[current]):
+            child = tree.expand(current, state)
+            if child != MctsTree.NO_NODE:
+                self.stats.nodes += 1
+                current = child
+                state[tree.action_stack[current]] -= tree.action_items[current]
+                depth += 1
         
+        self.stats.max_depth = max(self.stats.max_depth, depth)
         return current
 
+    def _can_expand(self, action_count: int, expanded: int, visits: int) -> bool:
+        """Whether a node with the given number of actions, children and visits gets a new child"""
+        if expanded >= action_count:
+            return False
+        if not self.progressive_widening or action_count <= self.WIDENING_MIN_ACTIONS:
+            return True
+        return expanded < self.WIDENING_CONSTANT * (visits + 1) ** self.WIDENING_EXPONENT
+
+    def _current_best_move(self) -> Move | None:
+        tree = self._search_tree
+        if tree is None or tree.first_child[tree.root] == MctsTree.NO_NODE:
+            return None
+
+        stack_idx, items = tree.get_action(max(tree.children(tree.root), key=lambda c: tree.visits[c]))
+        return Move(stack_index=self._tree_indices[stack_idx], items_to_remove=items)
+
+    @staticmethod
+    def ucb_score(tree: MctsTree, node: int, exploration_weight: float = 1.0) -> float:
+        """Calculate UCB score for node selection"""
+        visits = tree.visits[node]
+        if visits == 0:
+            return float('inf')
+        
+        # Exploitation component
+        exploitation = tree.wins[node] / visits
+        
+        # Exploration component
+        exploration = exploration_weight * math.sqrt(math.log(tree.visits[tree.parent[node]]) / visits)
+        
+        return exploitation + exploration
+
     def simulate_random_game(self, state: list[int]) -> int:
         """
         Simulate a random game from the given state and return the winner
         
         Returns:
-            1 if first player wins, 0 if second player wins
+            0 if the player to move in the given state wins, 1 if the other player wins
         """
-        # In Misère Nim, the player who takes the last item loses
-        state = state.copy()
-        current_player = 0  # 0 for first player, 1 for second player
-        
-        while sum(state) > 0:
-            # Get all possible moves
-            possible_moves = []
-            for i, stack_size in enumerate(state):
-                for items in range(1, stack_size + 1):
-                    possible_moves.append((i, items))
-                    
-            # Make a random move
-            stack_idx, items = random.choice(possible_moves)
-            state[stack_idx] -= items
-            
-            # Switch player
-            current_player = 1 - current_player
+        self.stats.rollouts += 1
+        return simulate_random_game(state)
+
+    def simulate_random_games(self, state: list[int], games: int, rng: np.random.Generator) -> int:
+        """
+        Simulate many random games from the given state at once
         
-        # In Misère Nim, the player who takes the last item loses
-        # So the winner is the current player
-        # The one who just moved took last item, but then we switched current player
-        winner = current_player
-        return winner
+        Returns:
+            Number of games won by the player to move in the given state
+        """
+        self.stats.rollouts += games
+        return simulate_random_games(state, games, rng)
 
-    def backpropagate(self, node: Node, winner: int):
+    def backpropagate(self, tree: MctsTree, node: int, winner: int):
         """Backpropagate the result up the tree"""
         current = node
         player = 1  # Start with player who just moved (opposite of the node's player)
         
-        while current:
-            current.visits += 1
+        while current != MctsTree.NO_NODE:
+            tree.visits[current] += 1
             # If this node's player is the winner, increment wins
             if player == winner:
-                current.wins += 1
+                tree.wins[current] += 1
                 
             # Switch players as we move up the tree
             player = 1 - player
-            current = current.parent
+            current = tree.parent[current]
+
+    def backpropagate_many(self, tree: MctsTree, node: int, games: int, wins: int):
+        """Backpropagate the results of many games played from the node, won `wins` times by the player to move there"""
+        current = node
+        player_wins = games - wins  # Start with player who just moved (opposite of the node's player)
+        
+        while current != MctsTree.NO_NODE:
+            tree.visits[current] += games
+            tree.wins[current] += player_wins
+                
+            # Switch players as we move up the tree
+            player_wins = games - player_wins
+            current = tree.parent[current]
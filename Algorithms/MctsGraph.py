@@ -0,0 +1,276 @@
+import math
+import random
+import sys
+
+import numpy as np
+
+from Algorithms.AlgorithmBase import Move, measured
+from Algorithms.GameState import GameState
+from Algorithms.Mcts import MctsAlgorithm
+from Algorithms.MctsTree import MctsTree
+from Algorithms.Tablebase import Tablebase
+
+
+class GraphNode:
+    """
+    Position in the search graph, shared by all move orders and stack permutations that reach it.
+
+    Actions are (stack height, items to remove) - moves from stacks of the same height are the same move.
+    They are numbered in the order of the sorted distinct heights and tried in the random order
+    of an affine permutation, like in MctsTree.
+    """
+
+    __slots__ = ("stacks", "total", "visits", "wins", "action_count", "expanded", "permutation_offset",
+                 "permutation_stride", "children", "actions", "edge_visits")
+
+    def __init__(self, stacks: tuple[int, ...], action_count: int):
+        # Canonical stacks, to tell positions with the same hash apart
+        self.stacks: tuple[int, ...] = stacks
+        self.total: int = sum(stacks)
+        self.visits: int = 0
+        # Games won by the player who moved into this position
+        self.wins: int = 0
+        self.action_count: int = action_count
+        self.expanded: int = 0
+        self.permutation_offset: int = random.randrange(action_count) if action_count > 0 else 0
+        self.permutation_stride: int = _coprime_stride(action_count)
+
+        # Outgoing edges - child, its action and how many times the search went through that edge
+        self.children: list[GraphNode] = []
+        self.actions: list[tuple[int, int]] = []
+        self.edge_visits: list[int] = []
+
+    def is_terminal(self) -> bool:
+        return self.action_count == 0
+
+
+def _coprime_stride(action_count: int) -> int:
+    stride = random.randint(1, action_count) if action_count > 0 else 1
+    while math.gcd(stride, action_count) != 1:
+        stride = random.randint(1, action_count)
+    return stride
+
+
+def _distinct_heights(state: GameState) -> list[int]:
+    return sorted(set(stack for stack in state if stack > 0))
+
+
+class MctsGraphAlgorithm(MctsAlgorithm):
+    """
+    MCTS over a graph of positions instead of a tree. Nodes are kept in a dict keyed on GameState.hash,
+    the hash of the multiset of non-empty stacks, so every transposition and permutation of stacks
+    is a single node with a single set of statistics.
+
+    Selection is UCT with shared node statistics: the value of an edge is the win rate of its child over
+    all visits of the child, the exploration term uses the visits of the edge itself. Results are propagated
+    along the path the iteration took, which is all that a game played through that path proves.
+    """
+
+    def __init__(self, max_nodes: int = 4_000_000, reuse_tree: bool = True, rollouts_per_leaf: int = 1,
+                 tablebase: Tablebase | None = None, progressive_widening: bool = True):
+        """
+        Args:
+            max_nodes: limit of positions in the graph
+            reuse_tree: keep the graph between moves - positions are the same in every game,
+                only those with more items than the current position are dropped. A full graph that does not
+                have the position to search is started anew.
+            rollouts_per_leaf: random games played from every selected leaf - more than one are played
+                as a single vectorized batch
+            tablebase: endgame tablebase - leaves it covers get their exact result instead of random games
+            progressive_widening: add edges of positions with many actions (tall stacks) as their visits grow
+        """
+        super().__init__(max_nodes, reuse_tree, rollouts_per_leaf, tablebase,
+                         progressive_widening=progressive_widening)
+        self._nodes: dict[int, GraphNode] = {}
+        # Position of the running search, for progress reports
+        self._search_state: GameState | None = None
+        # The graph was grown while pondering
+        self._pondered: bool = False
+
+    @classmethod
+    def get_name(cls) -> str:
+        return "MCTS Graph"
+
+    @measured
+    def get_move(self, stacks: GameState, depth: int) -> Move:
+        """Implement the abstract method from AlgorithmBase"""
+        self._pondered = False
+        self._prepare_graph(stacks)
+        height, items = self.nim_misere_graph(stacks, depth)
+        return Move(stack_index=stacks.index(height), items_to_remove=items)
+
+    def _prepare_graph(self, stacks: GameState) -> None:
+        if not self.reuse_tree:
+            self._nodes = {}
+        elif any(node.total > stacks.total for node in self._nodes.values()):
+            # Positions with more items cannot be reached anymore
+            self._nodes = {key: node for key, node in self._nodes.items() if node.total <= stacks.total}
+
+    def ponder_hit(self, stacks: GameState) -> bool:
+        # Pondering grows the graph for all replies, it is a hit if the reply that was played is in it
+        node = self._find_node(stacks)
+        return self._pondered and node is not None and node.visits > 0
+
+    def _ponder(self, stacks: GameState) -> None:
+        """Search the position the opponent is to move in, which visits the positions after all its replies"""
+        self._pondered = True
+        self._prepare_graph(stacks)
+        self.nim_misere_graph(stacks, sys.maxsize)
+
+    def nim_misere_graph(self, state: GameState, iterations: int) -> tuple[int, int]:
+        """
+        Args:
+            state: stacks to search from
+            iterations: number of MCTS iterations
+
+        Returns:
+            Best action as (stack height, items to remove)
+        """
+        self._search_state = state
+        root = self._get_or_add_node(state)
+        if root is None:
+            # The graph is full and does not have this position (or it has another one with the same hash) -
+            # what it knows is about other games, start a new graph instead of playing without a search
+            self._nodes = {}
+            root = self._get_or_add_node(state)
+
+        # Seeded from random, so that seeding it still makes the search reproducible
+        rng = np.random.default_rng(random.getrandbits(64)) if self.rollouts_per_leaf > 1 else None
+
+        for _ in range(iterations):
+            if self._deadline_passed():
+                break
+
+            self.stats.iterations += 1
+            path, leaf, leaf_state = self.select_path(root, state)
+            games = self.rollouts_per_leaf
+            win = self.tablebase.probe_win(leaf_state) if self.tablebase is not None else None
+            if win is not None:
+                self.stats.tablebase_hits += 1
+                wins = games if win else 0
+            elif rng is not None:
+                wins = self.simulate_random_games(list(leaf_state), games, rng)
+            else:
+                wins = 1 - self.simulate_random_game(list(leaf_state))
+            self.backpropagate_path(path, leaf, games, wins)
+
+        if not root.children:
+            # If no children (should not happen in a valid game), pick a random move
+            return self._random_action(state)
+
+        best_edge = max(range(len(root.children)), key=lambda i: root.edge_visits[i])
+        return root.actions[best_edge]
+
+    @staticmethod
+    def _random_action(state: GameState) -> tuple[int, int]:
+        stack_index, items = MctsTree.action_from_ordinal(list(state), random.randrange(state.total))
+        return state[stack_index], items
+
+    def _find_node(self, state: GameState) -> GraphNode | None:
+        node = self._nodes.get(state.hash)
+        return node if node is not None and node.stacks == state.canonical() else None
+
+    def _get_or_add_node(self, state: GameState) -> GraphNode | None:
+        """
+        Returns:
+            Node of the position, or None if it is not in the graph and cannot be added - the graph is full,
+            or another position with the same hash is in it
+        """
+        canonical = state.canonical()
+        node = self._nodes.get(state.hash)
+        if node is not None:
+            return node if node.stacks == canonical else None
+
+        if len(self._nodes) >= self.max_nodes:
+            return None
+        node = GraphNode(canonical, sum(set(canonical)))
+        self._nodes[state.hash] = node
+        self.stats.nodes += 1
+        return node
+
+    def select_path(self, root: GraphNode, state: GameState) -> tuple[list[tuple[GraphNode, int]], GraphNode | None,
+                                                                      GameState]:
+        """
+        Walk down the graph using UCT and add one new edge at the end of the walk.
+
+        Returns:
+            Traversed edges as (node, edge index), the node the walk ended in (None if the graph was full
+            and the position is not in it) and the state of that node
+        """
+        path = []
+        current = root
+
+        while not self._can_expand(current.action_count, current.expanded, current.visits) \
+                and not current.is_terminal():
+            edge = self._select_edge(current)
+            path.append((current, edge))
+            height, items = current.actions[edge]
+            state = state.after(state.index(height), items)
+            current = current.children[edge]
+
+        if self._can_expand(current.action_count, current.expanded, current.visits):
+            heights = _distinct_heights(state)
+            ordinal = (current.permutation_offset + current.expanded * current.permutation_stride) % current.action_count
+            height_index, items = MctsTree.action_from_ordinal(heights, ordinal)
+            child_state = state.after(state.index(heights[height_index]), items)
+
+            known = self._find_node(child_state) is not None
+            child = self._get_or_add_node(child_state)
+            if child is not None:
+                if known:
+                    # Reached by another move order - the new edge shares its statistics
+                    self.stats.tt_hits += 1
+                current.children.append(child)
+                current.actions.append((heights[height_index], items))
+                current.edge_visits.append(0)
+                current.expanded += 1
+                path.append((current, len(current.children) - 1))
+                current = child
+                state = child_state
+
+        self.stats.max_depth = max(self.stats.max_depth, len(path))
+        return path, current, state
+
+    @staticmethod
+    def _select_edge(node: GraphNode, exploration_weight: float = 1.0) -> int:
+        log_visits = math.log(node.visits)
+        best_edge = 0
+        best_score = -math.inf
+        for edge, child in enumerate(node.children):
+            edge_visits = node.edge_visits[edge]
+            if edge_visits == 0:
+                return edge
+
+            score = child.wins / child.visits + exploration_weight * math.sqrt(log_visits / edge_visits)
+            if score > best_score:
+                best_edge = edge
+                best_score = score
+        return best_edge
+
+    @staticmethod
+    def backpropagate_path(path: list[tuple[GraphNode, int]], leaf: GraphNode | None, games: int, wins: int) -> None:
+        """
+        Args:
+            path: traversed edges as (node, edge index)
+            leaf: node the walk ended in, None if it is not in the graph
+            games: games played from the leaf
+            wins: games won by the player to move at the leaf
+        """
+        player_wins = games - wins  # Start with player who just moved into the leaf
+        if leaf is not None:
+            leaf.visits += games
+            leaf.wins += player_wins
+
+        for node, edge in reversed(path):
+            player_wins = games - player_wins
+            node.edge_visits[edge] += games
+            node.visits += games
+            node.wins += player_wins
+
+    def _current_best_move(self) -> Move | None:
+        root = self._find_node(self._search_state) if self._search_state is not None else None
+        if root is None or not root.children:
+            return None
+
+        height, items = root.actions[max(range(len(root.children)), key=lambda i: root.edge_visits[i])]
+        return Move(stack_index=self._search_state.index(height), items_to_remove=items)
@@ -0,0 +1,222 @@
+import math
+import random
+from array import array
+
+import numpy as np
+
+
+class MctsTree:
+    """
+    MCTS tree stored as a structure of arrays - node i is described by the i-th element of every array.
+    States are not stored, they are recomputed from the root state while descending the tree.
+
+    Actions of a node are numbered 0..action_count-1 in (stack_index, items_to_remove) order.
+    Children are created lazily, in a random order given by an affine permutation of those numbers
+    (offset + k * stride) % action_count, so no list of untried actions is ever built.
+
+    The tree never has more than max_nodes nodes. When it is full, recycle() collapses the subtrees
+    with the fewest visits back into leaves and their slots are reused for new nodes.
+    """
+
+    NO_NODE: int = -1
+    # Parent of a recycled slot
+    FREE_NODE: int = -2
+    # Bytes of all arrays of a single node, including its place in the list of recycled slots
+    NODE_BYTES: int = 5 * array('i').itemsize + 7 * array('q').itemsize
+    # Part of max_nodes freed by a single recycle(), so that it does not happen on every iteration
+    RECYCLE_FRACTION: float = 0.25
+
+    def __init__(self, root_state: list[int], max_nodes: int = 4_000_000, initial_capacity: int = 1024):
+        self.root_state: list[int] = list(root_state)
+        self.max_nodes: int = max_nodes
+        # Nodes in the tree, slots taken from the arrays so far and recycled slots among them
+        self.size: int = 0
+        self.capacity: int = 0
+        self._used_slots: int = 0
+        self._free_slots: array = array('i')
+
+        self.parent: array = array('i')
+        self.first_child: array = array('i')
+        self.next_sibling: array = array('i')
+        self.action_stack: array = array('i')
+        self.action_items: array = array('q')
+        self.visits: array = array('q')
+        self.wins: array = array('q')
+        self.expanded: array = array('q')
+        self.action_count: array = array('q')
+        self.permutation_offset: array = array('q')
+        self.permutation_stride: array = array('q')
+
+        self._grow(min(initial_capacity, max_nodes))
+        self.root: int = self._new_node(self.NO_NODE, 0, 0, sum(root_state))
+
+    def _arrays(self) -> list[array]:
+        return [self.parent, self.first_child, self.next_sibling, self.action_stack, self.action_items, self.visits,
+                self.wins, self.expanded, self.action_count, self.permutation_offset, self.permutation_stride]
+
+    def _grow(self, new_capacity: int) -> None:
+        for buffer in self._arrays():
+            buffer.frombytes(bytes(buffer.itemsize * (new_capacity - self.capacity)))
+        self.capacity = new_capacity
+
+    def _new_node(self, parent: int, stack_index: int, items: int, action_count: int) -> int:
+        if self._free_slots:
+            node = self._free_slots.pop()
+        else:
+            if self._used_slots == self.capacity:
+                self._grow(min(self.capacity * 2, self.max_nodes))
+            node = self._used_slots
+            self._used_slots += 1
+        self.size += 1
+
+        stride = random.randint(1, action_count) if action_count > 0 else 1
+        while math.gcd(stride, action_count) != 1:
+            stride = random.randint(1, action_count)
+
+        self.parent[node] = parent
+        self.first_child[node] = self.NO_NODE
+        self.next_sibling[node] = self.NO_NODE
+        self.action_stack[node] = stack_index
+        self.action_items[node] = items
+        self.visits[node] = 0
+        self.wins[node] = 0
+        self.expanded[node] = 0
+        self.action_count[node] = action_count
+        self.permutation_offset[node] = random.randrange(action_count) if action_count > 0 else 0
+        self.permutation_stride[node] = stride
+        return node
+
+    def is_full(self) -> bool:
+        return self.size >= self.max_nodes
+
+    def memory(self) -> int:
+        """Bytes taken by the arrays of the tree"""
+        return self.capacity * self.NODE_BYTES
+
+    def recycle(self) -> int:
+        """
+        Free at least RECYCLE_FRACTION of max_nodes by collapsing the subtrees with the fewest visits into leaves.
+        Visits never grow from a node to its children, so freeing every node whose parent has at most
+        some number of visits frees whole subtrees. Collapsed nodes keep their statistics and get expanded again
+        from their first action when the search reaches them. Children of the root are never freed.
+
+        Must not be called in the middle of an iteration, as it may free nodes on its path.
+
+        Returns:
+            Number of freed nodes
+        """
+        parent = np.frombuffer(self.parent, dtype=np.int32, count=self._used_slots)
+        visits = np.frombuffer(self.visits, dtype=np.int64, count=self._used_slots)
+        candidates = np.flatnonzero(parent >= 0)
+        candidate_parents = parent[candidates]
+        parent_visits = visits[candidate_parents]
+        parent_visits[candidate_parents == self.root] = np.iinfo(np.int64).max
+
+        target = min(max(1, int(self.max_nodes * self.RECYCLE_FRACTION)), len(candidates))
+        if target == 0:
+            return 0
+        threshold = np.partition(parent_visits, target - 1)[target - 1]
+        if threshold == np.iinfo(np.int64).max:
+            return 0
+
+        freed = candidates[parent_visits <= threshold]
+        collapsed = np.unique(parent[freed])
+        np.frombuffer(self.first_child, dtype=np.int32, count=self._used_slots)[collapsed] = self.NO_NODE
+        np.frombuffer(self.expanded, dtype=np.int64, count=self._used_slots)[collapsed] = 0
+        parent[freed] = self.FREE_NODE
+
+        self._free_slots.frombytes(freed.astype(np.int32).tobytes())
+        self.size -= len(freed)
+        return len(freed)
+
+    def is_terminal(self, node: int) -> bool:
+        return self.action_count[node] == 0
+
+    def has_untried_actions(self, node: int) -> bool:
+        return self.expanded[node] < self.action_count[node]
+
+    def get_action(self, node: int) -> tuple[int, int]:
+        return self.action_stack[node], self.action_items[node]
+
+    def children(self, node: int):
+        child = self.first_child[node]
+        while child != self.NO_NODE:
+            yield child
+            child = self.next_sibling[child]
+
+    def expand(self, node: int, state: list[int]) -> int:
+        """
+        Add the next untried child of the node.
+
+        Args:
+            node: node with untried actions
+            state: state of that node
+
+        Returns:
+            The new child, or NO_NODE if the tree already has max_nodes nodes
+        """
+        if self.is_full():
+            return self.NO_NODE
+
+        count = self.action_count[node]
+        ordinal = (self.permutation_offset[node] + self.expanded[node] * self.permutation_stride[node]) % count
+        stack_index, items = self.action_from_ordinal(state, ordinal)
+
+        child = self._new_node(node, stack_index, items, count - items)
+        self.next_sibling[child] = self.first_child[node]
+        self.first_child[node] = child
+        self.expanded[node] += 1
+        return child
+
+    @staticmethod
+    def action_from_ordinal(state: list[int], ordinal: int) -> tuple[int, int]:
+        for stack_index, stack_size in enumerate(state):
+            if ordinal < stack_size:
+                return stack_index, ordinal + 1
+            ordinal -= stack_size
+
+        raise IndexError("Action ordinal out of range")
+
+    def extract_subtree(self, node: int, state: list[int]) -> 'MctsTree':
+        """
+        Copy the subtree of the given node into a new, compact tree with that node as the root.
+        Statistics are kept, the rest of this tree can be freed afterwards.
+
+        Args:
+            node: new root
+            state: state of that node
+        """
+        subtree = MctsTree(state, self.max_nodes, initial_capacity=1024)
+        self._copy_node_fields(node, subtree, subtree.root, MctsTree.NO_NODE)
+
+        pending = [(node, subtree.root)]
+        while pending:
+            old_parent, new_parent = pending.pop()
+            previous = MctsTree.NO_NODE
+            for old_child in self.children(old_parent):
+                new_child = subtree._new_node(new_parent, 0, 0, 0)
+                self._copy_node_fields(old_child, subtree, new_child, new_parent)
+
+                # Keep the order of siblings
+                if previous == MctsTree.NO_NODE:
+                    subtree.first_child[new_parent] = new_child
+                else:
+                    subtree.next_sibling[previous] = new_child
+                previous = new_child
+
+                pending.append((old_child, new_child))
+
+        return subtree
+
+    def _copy_node_fields(self, node: int, target: 'MctsTree', target_node: int, target_parent: int) -> None:
+        target.parent[target_node] = target_parent
+        target.first_child[target_node] = MctsTree.NO_NODE
+        target.next_sibling[target_node] = MctsTree.NO_NODE
+        target.action_stack[target_node] = self.action_stack[node]
+        target.action_items[target_node] = self.action_items[node]
+        target.visits[target_node] = self.visits[node]
+        target.wins[target_node] = self.wins[node]
+        target.expanded[target_node] = self.expanded[node]
+        target.action_count[target_node] = self.action_count[node]
+        target.permutation_offset[target_node] = self.permutation_offset[node]
+        target.permutation_stride[target_node] = self.permutation_stride[node]
@@ -0,0 +1,111 @@
+from collections import defaultdict
+
+from Algorithms.GameState import GameState
+
+
+class MoveOrdering:
+    """
+    Decides in which order a search visits the moves of a position.
+    Moves are (stack_index, items_to_remove) tuples. Moves that differ only by taking from another stack
+    of the same height lead to the same position, so only the first such stack is used.
+
+    The base class keeps the plain order: stack index first, then 1..n items.
+    """
+
+    def new_search(self) -> None:
+        """Called before every search from the root"""
+        pass
+
+    def order_moves(self, stacks: GameState, ply: int, hash_move: tuple[int, int] | None) -> list[tuple[int, int]]:
+        """
+        Args:
+            stacks: current stacks
+            ply: distance from the root of the search
+            hash_move: best move found for this position before, as (stack height, items to remove)
+        """
+        return self.generate_moves(stacks)
+
+    def record_cutoff(self, stacks: GameState, move: tuple[int, int], ply: int, depth: int) -> None:
+        """Called when the given move caused a beta cutoff"""
+        pass
+
+    @staticmethod
+    def generate_moves(stacks: GameState) -> list[tuple[int, int]]:
+        moves = []
+        seen_heights = set()
+        for stack, height in enumerate(stacks):
+            if height == 0 or height in seen_heights:
+                continue
+            seen_heights.add(height)
+            for i in range(1, height + 1):
+                moves.append((stack, i))
+        return moves
+
+
+class HeuristicMoveOrdering(MoveOrdering):
+    """
+    Orders moves by, in turn:
+        - the hash move (best move of the previous iteration or the transposition table)
+        - moves that leave a position lost for the opponent according to the nim-sum
+        - killer moves - moves that caused a cutoff at the same ply
+        - history heuristic - how often and how deep the move caused cutoffs before
+    Killer and history moves are remembered as (stack height, items to remove), as stack indices mean nothing
+    across different positions. That also makes them much weaker guesses than the nim-sum, so they come after it.
+    """
+
+    KILLERS_PER_PLY: int = 2
+
+    def __init__(self):
+        self.killers: defaultdict[int, list[tuple[int, int]]] = defaultdict(list)
+        self.history: defaultdict[tuple[int, int], int] = defaultdict(int)
+
+    def new_search(self) -> None:
+        # History is still useful in the next search, killers are tied to the old plies
+        self.killers.clear()
+        for move in self.history:
+            self.history[move] //= 2
+
+    def order_moves(self, stacks: GameState, ply: int, hash_move: tuple[int, int] | None) -> list[tuple[int, int]]:
+        moves = self.generate_moves(stacks)
+        killers = self.killers.get(ply, [])
+        nim_sum_moves = self.nim_sum_moves(stacks)
+
+        def priority(move: tuple[int, int]) -> tuple[int, int]:
+            stack, items = move
+            key = (stacks[stack], items)
+            if key == hash_move:
+                return (0, 0)
+            if key in nim_sum_moves:
+                return (1, 0)
+            if key in killers:
+                return (2, killers.index(key))
+            return (3, -self.history.get(key, 0))
+
+        moves.sort(key=priority)
+        return moves
+
+    def record_cutoff(self, stacks: GameState, move: tuple[int, int], ply: int, depth: int) -> None:
+        stack, items = move
+        key = (stacks[stack], items)
+
+        killers = self.killers[ply]
+        if key not in killers:
+            killers.insert(0, key)
+            del killers[self.KILLERS_PER_PLY:]
+
+        self.history[key] += depth * depth
+
+    @staticmethod
+    def nim_sum_moves(stacks: GameState) -> set[tuple[int, int]]:
+        """Moves (as stack height, items to remove) that leave a misère Nim position lost for the opponent"""
+        if stacks.big_stacks == 0:
+            return set()
+
+        if stacks.big_stacks == 1:
+            # Leave an odd number of stacks with a single item
+            ones = stacks.non_zero - 1
+            height = max(stacks)
+            return {(height, height - 1) if ones % 2 == 0 else (height, height)}
+
+        nim_sum = stacks.nim_sum
+        return {(stack, stack - (stack ^ nim_sum)) for stack in stacks if stack ^ nim_sum < stack}
@@ -1,13 +1,57 @@
-from Algorithms.AlgorithmBase import AlgorithmBase, Move
+from Algorithms.AlgorithmBase import AlgorithmBase, Move, measured
+from Algorithms.GameState import GameState
+from Algorithms.PositionCache import PositionCache
 
 
 class Optimal(AlgorithmBase):
-    def get_move(self, stacks: list[int], depth: int) -> Move:
-        non_zero_indices = [i for i, stack in enumerate(stacks) if stack > 0]
-        non_zero_stacks = [stacks[i] for i in non_zero_indices]
-        
-        move = self.optimal_nim_move(non_zero_stacks)
-        return Move(stack_index=non_zero_indices[move.stack_index], items_to_remove=move.items_to_remove)
+    def __init__(self, position_cache: PositionCache | None = None):
+        """
+        Args:
+            position_cache: persistent cache to cross-check - entries that disagree with the nim-sum strategy
+                are corrected, missing ones are added, so other algorithms can use them
+        """
+        super().__init__()
+        self.position_cache: PositionCache | None = position_cache
+
+    @measured
+    def get_move(self, stacks: GameState, depth: int) -> Move:
+        non_zero_indices = stacks.non_zero_indices()
+        if stacks.big_stacks == 0:
+            # In endgame with only 1s, all moves are equivalent
+            move = Move(stack_index=non_zero_indices[0], items_to_remove=1)
+        else:
+            move = self.optimal_nim_move(stacks.non_zero_stacks())
+            move = Move(stack_index=non_zero_indices[move.stack_index], items_to_remove=move.items_to_remove)
+
+        if self.position_cache is not None:
+            self._cross_check(stacks, move)
+        return move
+
+    def _cross_check(self, stacks: GameState, move: Move) -> None:
+        value = 1 if self.player_to_move_wins(stacks) else -1
+        cached = self.position_cache.get(stacks)
+        if cached is not None and cached.value == value:
+            self.stats.cache_hits += 1
+        else:
+            # Other algorithms play the stored move without a search - it is stored only if it leaves the opponent
+            # a lost position, which the fallback of optimal_nim_move does not always do
+            after = stacks.after(move.stack_index, move.items_to_remove)
+            best_move = (stacks[move.stack_index], move.items_to_remove) \
+                if not self.player_to_move_wins(after) else None
+            # A search of all remaining items proves the same result, so that is the depth it is stored with
+            self.position_cache.put(stacks, value, stacks.total, best_move)
+
+    def close(self) -> None:
+        # The cache is shared with other players, it is only flushed
+        if self.position_cache is not None:
+            self.position_cache.flush()
+
+    @staticmethod
+    def player_to_move_wins(stacks: GameState) -> bool:
+        if stacks.big_stacks == 0:
+            # The player to move wins if the opponent is left to take the last 1
+            return stacks.non_zero % 2 == 0
+        return stacks.nim_sum != 0
     
     def _uses_depth(self) -> bool:
         return False
@@ -19,55 +63,49 @@ class Optimal(AlgorithmBase):
     @staticmethod
     def optimal_nim_move(state: list[int]) -> Move:
         """
-        Calculate the optimal move for Misère Nim using nim-sum strategy
-        
+        Calculate the optimal move for Misère Nim using nim-sum strategy.
+        Every stack is visited at most twice, the winning size of a stack is computed directly as stack ^ nim_sum.
+
         Args:
             state: stack sizes (excluding empty stacks)
-            
+
         Returns:
             Move object with stack index and items to take
         """
-        if all(s == 1 for s in state):
+        nim_sum = 0
+        big_stacks = 0
+        max_stack_idx = 0
+        for i, stack in enumerate(state):
+            nim_sum ^= stack
+            if stack > 1:
+                big_stacks += 1
+            if stack > state[max_stack_idx]:
+                max_stack_idx = i
+
+        if big_stacks == 0:
             # In endgame with only 1s, all moves are equivalent
             return Move(stack_index=0, items_to_remove=1)
-        
-        # If there is only one stack with more than 1 item, 
+
+        # If there is only one stack with more than 1 item,
         # we need to ensure that after the move we have an odd number of 1s
-        if sum(1 for s in state if s > 1) == 1:
-            max_stack_idx = state.index(max(state))
+        if big_stacks == 1:
             items_to_remove = state[max_stack_idx] - 1 if len(state) % 2 == 1 else state[max_stack_idx]
             return Move(stack_index=max_stack_idx, items_to_remove=items_to_remove)
 
-        nim_sum = 0
-        for stack in state:
-            nim_sum ^= stack
-        
         if nim_sum == 0:
             # If nim-sum is 0, we lose with optimal play - do whatever
-            max_stack_idx = state.index(max(state))
             return Move(stack_index=max_stack_idx, items_to_remove=1)
-        
+
+        # With at least two stacks above 1, one of them is left after the move, so it is not the endgame yet
+        # and reaching nim-sum 0 wins
         for i, stack in enumerate(state):
             if stack == 1:
                 continue
 
-            # Calculate how many to take to get the best nim-sum
-            for take in range(1, stack + 1):
-                new_stack = stack - take
-                new_nim_sum = nim_sum ^ stack ^ new_stack
-                
-                if new_nim_sum == 0:
-                    # This is good unless it leaves only 1s
-                    new_state = state.copy()
-                    new_state[i] = new_stack
-                    if sum(1 for s in new_state if s > 1) == 0:
-                        # If this leaves only 1s, ensure odd count for misère win
-                        ones_in_new = sum(1 for s in new_state if s == 1)
-                        if ones_in_new % 2 == 0:
-                            return Move(stack_index=i, items_to_remove=take)
-                    else:
-                        return Move(stack_index=i, items_to_remove=take)
-        
-        # this should never happen
-        print(f"No winning move found for nim-sum = {nim_sum} ({state})")
+            new_stack = stack ^ nim_sum
+            if new_stack < stack:
+                return Move(stack_index=i, items_to_remove=stack - new_stack)
+
+        # The only stack that brings the nim-sum to 0 is a stack of 1 (e.g. [2, 2, 1]) - those are skipped
+        # to keep the moves of the previous implementation, so this move may lose
         return Move(stack_index=0, items_to_remove=1)
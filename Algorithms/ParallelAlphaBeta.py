@@ -0,0 +1,192 @@
+import math
+import multiprocessing
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+
+from Algorithms.AlgorithmBase import CancellationToken, Move, SearchCancelled, SearchStats, SearchTimeout, measured
+from Algorithms.AlphaBeta import AlphaBetaAlgorithm
+from Algorithms.GameState import GameState
+from Algorithms.TranspositionTable import SharedTranspositionTable
+
+
+# Set in every worker process - its search, attached to the shared table, and the event that stops it
+_worker_algorithm: AlphaBetaAlgorithm | None = None
+
+
+def _init_worker(table_name: str, table_size: int, stop_event) -> None:
+    global _worker_algorithm
+    _worker_algorithm = AlphaBetaAlgorithm()
+    _worker_algorithm.transposition_table = SharedTranspositionTable(table_size, table_name)
+    _worker_algorithm.cancellation_token = CancellationToken(stop_event)
+
+
+def _search_worker(state: list[int], max_depth: int, time_limit: float | None) -> tuple[int, Move | None, SearchStats]:
+    """
+    Worker of Lazy SMP - iterative deepening up to max_depth, until the time limit or until it is stopped.
+
+    Returns:
+        The deepest completed depth, the move found at it and stats of all depths
+    """
+    algorithm = _worker_algorithm
+    algorithm._deadline = time.perf_counter() + time_limit if time_limit is not None else math.inf
+    algorithm._polls_until_clock = algorithm.DEADLINE_POLL_INTERVAL
+    # All depths add to the same stats
+    algorithm._measuring = True
+    algorithm.stats = SearchStats()
+
+    stacks = GameState(state)
+    completed_depth = 0
+    move = None
+    try:
+        for depth in range(1, max_depth + 1):
+            move = algorithm.get_move(stacks, depth)
+            completed_depth = depth
+    except (SearchTimeout, SearchCancelled):
+        pass
+    finally:
+        algorithm._measuring = False
+        algorithm._deadline = math.inf
+
+    return completed_depth, move, algorithm.stats
+
+
+class ParallelAlphaBetaAlgorithm(AlphaBetaAlgorithm):
+    """
+    Lazy SMP - every worker process runs the same iterative deepening alpha-beta search from the root,
+    and they share a single transposition table in shared memory. Every other worker searches one depth deeper,
+    so the workers do not just repeat each other, and whatever one of them stores cuts the searches of the others.
+    The deepest completed result of any worker is played.
+
+    Tablebase and position cache are not used by the workers.
+    """
+
+    def __init__(self, workers: int | None = None, tt_size: int = 1_000_000):
+        """
+        Args:
+            workers: number of worker processes, all CPUs by default
+            tt_size: number of slots of the shared transposition table
+        """
+        super().__init__()
+        self.workers: int = workers if workers is not None else os.cpu_count() or 1
+        self.tt_size: int = tt_size
+        # Created with the worker pool and freed with it
+        self.transposition_table: SharedTranspositionTable | None = None
+        self._pool: ProcessPoolExecutor | None = None
+        self._stop_event = None
+        # Searches of a stopped move that were still running when it returned
+        self._stopped_futures: list[Future] = []
+
+    @classmethod
+    def get_name(cls) -> str:
+        return "AlphaBeta (Lazy SMP)"
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Forking a process that runs threads (like the UI) is not safe
+            context = multiprocessing.get_context("spawn")
+            self.transposition_table = SharedTranspositionTable(self.tt_size)
+            self._stop_event = context.Event()
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=context, initializer=_init_worker,
+                                             initargs=(self.transposition_table.name,
+                                                       self.transposition_table.max_size, self._stop_event))
+        return self._pool
+
+    def _start_workers(self) -> None:
+        """Start all worker processes of the pool, they are otherwise started by the first submitted searches"""
+        if self._pool is None:
+            pool = self._get_pool()
+            wait([pool.submit(os.getpid) for _ in range(self.workers)])
+
+    def close(self) -> None:
+        """Stop the worker processes and free the shared table"""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+        if self.transposition_table is not None:
+            self.transposition_table.close()
+            self.transposition_table = None
+
+    def can_ponder(self) -> bool:
+        # The searches run in the workers only while a move is computed
+        return False
+
+    def get_move_timed(self, stacks: GameState | list[int], time_for_move: float) -> Move:
+        # Starting the worker processes can take longer than a whole move, it is done before the clock starts
+        self._start_workers()
+        return super().get_move_timed(stacks, time_for_move)
+
+    @measured
+    def get_move(self, stacks: GameState, depth: int) -> Move:
+        self._root_indices = stacks.non_zero_indices()
+        self._searched_depth = depth
+        move = self._parallel_search(stacks.non_zero_stacks(), depth, None)
+        return Move(stack_index=self._root_indices[move.stack_index], items_to_remove=move.items_to_remove)
+
+    def _search_until_deadline(self, stacks: GameState) -> Move:
+        # The workers deepen on their own until the deadline
+        self._root_indices = stacks.non_zero_indices()
+        time_left = max(0.0, self._deadline - time.perf_counter())
+        move = self._parallel_search(stacks.non_zero_stacks(), stacks.total, time_left)
+        return Move(stack_index=self._root_indices[move.stack_index], items_to_remove=move.items_to_remove)
+
+    def _parallel_search(self, state: list[int], max_depth: int, time_limit: float | None) -> Move:
+        """
+        Returns:
+            The move of the deepest search completed by any worker, as an index into the given state
+        """
+        pool = self._get_pool()
+        if self._stopped_futures:
+            # They stop soon after seeing the event, it must stay set until they do
+            wait(self._stopped_futures)
+            self._stopped_futures = []
+        self._stop_event.clear()
+
+        # The game cannot last longer than the number of items left, so deeper searches change nothing
+        futures = [pool.submit(_search_worker, state, min(max_depth + worker % 2, sum(state)), time_limit)
+                   for worker in range(self.workers)]
+
+        best_depth = 0
+        best_move = None
+        self._root_best = None
+        pending = futures
+        while pending:
+            try:
+                deadline_passed = self._deadline_passed()
+            except SearchCancelled:
+                self._stop_event.set()
+                self._stopped_futures = [future for future in pending if not future.cancel()]
+                raise
+            if deadline_passed and not self._stop_event.is_set():
+                # Workers count their time limit from when they start, which is later than the move started
+                # (by the whole start of the pool on the first move) - they stop at the deadline of the move
+                # and report their deepest completed depth
+                self._stop_event.set()
+            done, pending = wait(pending, timeout=self.PROGRESS_INTERVAL, return_when=FIRST_COMPLETED)
+
+            for future in done:
+                depth, move, worker_stats = future.result()
+                self._add_worker_stats(worker_stats)
+                if move is not None and depth > best_depth:
+                    best_depth = depth
+                    best_move = move
+                    self._root_best = move
+
+            if best_depth >= max_depth and not self._stop_event.is_set():
+                # The requested depth is done - the workers still searching deeper stop and report what they have
+                self._stop_event.set()
+
+        self.stats.iterations += 1
+        if best_move is None:
+            # Not even the first depth was completed - any legal move will do
+            best_move = Move(stack_index=0, items_to_remove=1)
+        self.pv_move = (state[best_move.stack_index], best_move.items_to_remove)
+        return best_move
+
+    def _add_worker_stats(self, worker_stats: SearchStats) -> None:
+        self.stats.nodes += worker_stats.nodes
+        self.stats.leaf_evals += worker_stats.leaf_evals
+        self.stats.tt_hits += worker_stats.tt_hits
+        self.stats.cutoffs += worker_stats.cutoffs
+        self.stats.first_move_cutoffs += worker_stats.first_move_cutoffs
+        self.stats.max_depth = max(self.stats.max_depth, worker_stats.max_depth)
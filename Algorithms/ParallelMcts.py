@@ -0,0 +1,248 @@
+import math
+import multiprocessing
+import os
+import random
+import time
+from concurrent.futures import Future, ProcessPoolExecutor, wait
+
+from Algorithms.AlgorithmBase import CancellationToken, Move, SearchCancelled, SearchStats
+from Algorithms.GameState import GameState
+from Algorithms.Mcts import MctsAlgorithm
+from Algorithms.MctsTree import MctsTree
+
+
+# Set in every worker process of a root parallel pool - cancels the searches of all workers
+_cancel_event = None
+
+
+def _init_worker(cancel_event) -> None:
+    global _cancel_event
+    _cancel_event = cancel_event
+
+
+def _search_independent_tree(state: list[int], iterations: int, time_limit: float | None, max_nodes: int,
+                             seed: int) -> tuple[dict[tuple[int, int], int], SearchStats]:
+    """
+    Worker of root parallel MCTS - searches its own tree from the root.
+
+    Returns:
+        Visits of every child of the root, by action, and stats of the search
+    """
+    random.seed(seed)
+    algorithm = MctsAlgorithm(max_nodes=max_nodes, reuse_tree=False)
+    if _cancel_event is not None:
+        algorithm.cancellation_token = CancellationToken(_cancel_event)
+    if time_limit is not None:
+        algorithm._deadline = time.perf_counter() + time_limit
+
+    tree = MctsTree(state, max_nodes)
+    try:
+        algorithm.nim_misere_mcts(state, iterations, tree)
+    except SearchCancelled:
+        # Stopped at the deadline of the main process, or the move was cancelled - then the result is not used
+        pass
+    return {tree.get_action(child): tree.visits[child] for child in tree.children(tree.root)}, algorithm.stats
+
+
+def _simulate_games(states: list[list[int]], seed: int) -> list[int]:
+    """Worker of leaf parallel MCTS - plays a random game from every given state"""
+    random.seed(seed)
+    algorithm = MctsAlgorithm(reuse_tree=False)
+    return [algorithm.simulate_random_game(state) for state in states]
+
+
+class ParallelMctsAlgorithm(MctsAlgorithm):
+    """
+    Root parallel MCTS - every worker process searches an independent tree from the current position
+    and the visits of the root children are summed up to choose the move.
+    """
+
+    def __init__(self, workers: int | None = None, iterations_per_worker: int | None = None, max_nodes: int = 4_000_000,
+                 max_memory: int | None = None):
+        """
+        Args:
+            workers: number of worker processes, all CPUs by default
+            iterations_per_worker: iterations of every worker - by default the requested iterations are split evenly
+            max_nodes: limit of nodes in the tree of every worker
+            max_memory: limit of the tree of every worker in bytes
+        """
+        # Trees live in the workers, so there is nothing to reuse between moves
+        super().__init__(max_nodes=max_nodes, reuse_tree=False, max_memory=max_memory)
+        self.workers: int = workers if workers is not None else os.cpu_count() or 1
+        self.iterations_per_worker: int | None = iterations_per_worker
+        self._pool: ProcessPoolExecutor | None = None
+        self._cancel_event = None
+        # Searches of a cancelled move that were already running when it was cancelled
+        self._cancelled_futures: list[Future] = []
+
+    @classmethod
+    def get_name(cls) -> str:
+        return "MCTS (root parallel)"
+
+    def _get_pool(self) -> ProcessPoolExecutor:
+        if self._pool is None:
+            # Forking a process that runs threads (like the UI) is not safe
+            context = multiprocessing.get_context("spawn")
+            self._cancel_event = context.Event()
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=context, initializer=_init_worker,
+                                             initargs=(self._cancel_event,))
+        return self._pool
+
+    def _start_workers(self) -> None:
+        """Start all worker processes of the pool, they are otherwise started by the first submitted searches"""
+        if self._pool is None:
+            pool = self._get_pool()
+            wait([pool.submit(os.getpid) for _ in range(self.workers)])
+
+    def close(self) -> None:
+        """Stop the worker processes"""
+        if self._pool is not None:
+            self._pool.shutdown(cancel_futures=True)
+            self._pool = None
+
+    def can_ponder(self) -> bool:
+        # The trees are in the workers and gone after every move
+        return False
+
+    def get_move_timed(self, stacks: GameState | list[int], time_for_move: float) -> Move:
+        # Starting the worker processes can take longer than a whole move, it is done before the clock starts
+        self._start_workers()
+        return super().get_move_timed(stacks, time_for_move)
+
+    def _time_left(self) -> float | None:
+        return None if self._deadline == math.inf else max(0.0, self._deadline - time.perf_counter())
+
+    def nim_misere_mcts(self, state: list[int], iterations: int, tree: MctsTree | None = None) -> tuple[int, int]:
+        if self.iterations_per_worker is not None:
+            iterations_per_worker = [self.iterations_per_worker] * self.workers
+        else:
+            iterations_per_worker = [iterations // self.workers + (1 if i < iterations % self.workers else 0)
+                                     for i in range(self.workers)]
+
+        pool = self._get_pool()
+        if self._cancelled_futures:
+            # They stop soon after seeing the event, it must stay set until they do
+            wait(self._cancelled_futures)
+            self._cancelled_futures = []
+        self._cancel_event.clear()
+        futures = [pool.submit(_search_independent_tree, state, worker_iterations, self._time_left(), self.max_nodes,
+                               random.randrange(2**32))
+                   for worker_iterations in iterations_per_worker if worker_iterations > 0]
+
+        # Wake up regularly to pass the cancellation on to the workers and to report progress
+        pending = futures
+        while pending:
+            try:
+                deadline_passed = self._deadline_passed()
+            except SearchCancelled:
+                self._cancel_event.set()
+                self._cancelled_futures = [future for future in pending if not future.cancel()]
+                raise
+            if deadline_passed and not self._cancel_event.is_set():
+                # Workers count their time limit from when they start, which is later than the move started
+                # (by the whole start of the pool on the first move) - they stop at the deadline of the move
+                # and their trees are used as they are
+                self._cancel_event.set()
+            _, pending = wait(pending, timeout=self.PROGRESS_INTERVAL)
+
+        visits: dict[tuple[int, int], int] = {}
+        for future in futures:
+            worker_visits, worker_stats = future.result()
+            for action, action_visits in worker_visits.items():
+                visits[action] = visits.get(action, 0) + action_visits
+
+            self.stats.nodes += worker_stats.nodes
+            self.stats.iterations += worker_stats.iterations
+            self.stats.rollouts += worker_stats.rollouts
+            self.stats.max_depth = max(self.stats.max_depth, worker_stats.max_depth)
+            # The trees of all workers exist at the same time
+            self.stats.peak_memory += worker_stats.peak_memory
+            self.stats.recycled_nodes += worker_stats.recycled_nodes
+
+        if not visits:
+            return MctsTree.action_from_ordinal(state, random.randrange(sum(state)))
+
+        return max(visits, key=visits.get)
+
+
+class LeafParallelMctsAlgorithm(ParallelMctsAlgorithm):
+    """
+    Leaf parallel MCTS - a single tree is searched in the main process, the random games from its leaves
+    are played in batches by the worker processes. Leaves waiting for their results already count as visited
+    (virtual loss), so the rest of the batch is steered to other parts of the tree.
+    """
+
+    def __init__(self, workers: int | None = None, leaves_per_worker: int = 32, max_nodes: int = 4_000_000,
+                 max_memory: int | None = None):
+        """
+        Args:
+            workers: number of worker processes, all CPUs by default
+            leaves_per_worker: number of random games sent to a worker at once
+            max_nodes: limit of nodes in the tree
+            max_memory: limit of the tree in bytes
+        """
+        super().__init__(workers=workers, max_nodes=max_nodes, max_memory=max_memory)
+        self.leaves_per_worker: int = leaves_per_worker
+
+    @classmethod
+    def get_name(cls) -> str:
+        return "MCTS (leaf parallel)"
+
+    def can_ponder(self) -> bool:
+        return True
+
+    def nim_misere_mcts(self, state: list[int], iterations: int, tree: MctsTree | None = None) -> tuple[int, int]:
+        if tree is None:
+            tree = MctsTree(state, self.max_nodes)
+
+        self._search_tree = tree
+        pool = self._get_pool()
+        done = 0
+        while done < iterations and not self._deadline_passed():
+            batch_size = min(iterations - done, self.workers * self.leaves_per_worker)
+            # Only between batches, no leaf of the tree is waiting for its result then
+            self._recycle_if_full(tree)
+
+            leaves = []
+            leaf_states = []
+            self.stats.iterations += batch_size
+            for _ in range(batch_size):
+                node_state = state.copy()
+                node = self.select_node(tree, node_state)
+                self._add_visit(tree, node)
+                leaves.append(node)
+                leaf_states.append(node_state)
+
+            chunks = [leaf_states[i:i + self.leaves_per_worker] for i in range(0, batch_size, self.leaves_per_worker)]
+            futures = [pool.submit(_simulate_games, chunk, random.randrange(2**32)) for chunk in chunks]
+            winners = [winner for future in futures for winner in future.result()]
+
+            for node, winner in zip(leaves, winners):
+                self._add_win(tree, node, winner)
+            done += batch_size
+
+        self.stats.rollouts += done
+        self.stats.peak_memory = max(self.stats.peak_memory, tree.memory())
+
+        if tree.first_child[tree.root] == MctsTree.NO_NODE:
+            return MctsTree.action_from_ordinal(state, random.randrange(sum(state)))
+
+        best_child = max(tree.children(tree.root), key=lambda c: tree.visits[c])
+        return tree.get_action(best_child)
+
+    @staticmethod
+    def _add_visit(tree: MctsTree, node: int) -> None:
+        """First half of backpropagation - count the visit before the result is known"""
+        while node != MctsTree.NO_NODE:
+            tree.visits[node] += 1
+            node = tree.parent[node]
+
+    @staticmethod
+    def _add_win(tree: MctsTree, node: int, winner: int) -> None:
+        """Second half of backpropagation - count the wins once the random game is played"""
+        player = 1
+        while node != MctsTree.NO_NODE:
+            if player == winner:
+                tree.wins[node] += 1
+            player = 1 - player
+            node = tree.parent[node]
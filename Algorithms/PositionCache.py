@@ -0,0 +1,128 @@
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from typing import Sequence
+
+
+@dataclass
+class CachedPosition:
+    # 1 if the player to move wins, -1 if they lose
+    value: int
+    # Depth of the search that proved the result
+    depth: int
+    # Best move as (stack height, items to remove)
+    move: tuple[int, int] | None
+
+
+class PositionCache:
+    """
+    Proven results of positions, kept in a SQLite file between games and shared by all processes that open it.
+    Positions are keyed on the canonical multiset of nonzero stacks.
+
+    The database runs in WAL mode, so readers never wait for a writer and writers wait for each other
+    (up to `timeout`). Stores and the last-used times of looked up positions are buffered and written
+    in a single transaction by flush(). When the cache grows past max_entries, flush() evicts the least
+    recently used positions.
+    """
+
+    # Fraction of max_entries left after an eviction, so that it does not happen on every flush
+    EVICT_TO: float = 0.9
+
+    def __init__(self, path: str, max_entries: int = 1_000_000, timeout: float = 30.0):
+        self.path: str = path
+        self.max_entries: int = max_entries
+        # The search may run in another thread than the one that opened the cache, the lock serializes them
+        self._connection: sqlite3.Connection = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._lock: threading.Lock = threading.Lock()
+        self._pending: dict[str, tuple[int, int, str | None]] = {}
+        self._used: set[str] = set()
+
+        with self._lock, self._connection:
+            self._connection.execute("PRAGMA journal_mode=WAL")
+            self._connection.execute("PRAGMA synchronous=NORMAL")
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS positions ("
+                "key TEXT PRIMARY KEY, value INTEGER NOT NULL, depth INTEGER NOT NULL, move TEXT, "
+                "last_used REAL NOT NULL)")
+            self._connection.execute("CREATE INDEX IF NOT EXISTS positions_last_used ON positions (last_used)")
+        self._size: int = self._count()
+
+    @staticmethod
+    def canonical_key(stacks: Sequence[int]) -> str:
+        # Text, as SQLite integers cannot hold stacks of any size
+        return ",".join(map(str, sorted(stack for stack in stacks if stack > 0)))
+
+    def get(self, stacks: Sequence[int]) -> CachedPosition | None:
+        key = self.canonical_key(stacks)
+        with self._lock:
+            pending = self._pending.get(key)
+            if pending is not None:
+                row = pending
+            else:
+                row = self._connection.execute(
+                    "SELECT value, depth, move FROM positions WHERE key = ?", (key,)).fetchone()
+                if row is None:
+                    return None
+                self._used.add(key)
+
+        value, depth, move = row
+        return CachedPosition(value, depth, _decode_move(move))
+
+    def put(self, stacks: Sequence[int], value: int, depth: int, move: tuple[int, int] | None = None) -> None:
+        """Remember a proven result - it is written on the next flush()"""
+        with self._lock:
+            self._pending[self.canonical_key(stacks)] = (value, depth, _encode_move(move))
+
+    def flush(self) -> None:
+        with self._lock:
+            if not self._pending and not self._used:
+                return
+
+            now = time.time()
+            with self._connection:
+                self._connection.executemany(
+                    "UPDATE positions SET last_used = ? WHERE key = ?", [(now, key) for key in self._used])
+                self._connection.executemany(
+                    "INSERT INTO positions (key, value, depth, move, last_used) VALUES (?, ?, ?, ?, ?) "
+                    "ON CONFLICT (key) DO UPDATE SET value = excluded.value, depth = excluded.depth, "
+                    "move = excluded.move, last_used = excluded.last_used",
+                    [(key, value, depth, move, now) for key, (value, depth, move) in self._pending.items()])
+
+                # Other processes add positions too, so the count is only an estimate until it is recounted
+                self._size += len(self._pending)
+                if self._size > self.max_entries:
+                    self._size = self._count()
+                    if self._size > self.max_entries:
+                        evicted = self._size - int(self.max_entries * self.EVICT_TO)
+                        self._connection.execute(
+                            "DELETE FROM positions WHERE key IN "
+                            "(SELECT key FROM positions ORDER BY last_used LIMIT ?)", (evicted,))
+                        self._size -= evicted
+
+            self._pending.clear()
+            self._used.clear()
+
+    def close(self) -> None:
+        self.flush()
+        with self._lock:
+            self._connection.close()
+
+    def __len__(self) -> int:
+        self.flush()
+        with self._lock:
+            return self._count()
+
+    def _count(self) -> int:
+        return self._connection.execute("SELECT COUNT(*) FROM positions").fetchone()[0]
+
+
+def _encode_move(move: tuple[int, int] | None) -> str | None:
+    return None if move is None else f"{move[0]},{move[1]}"
+
+
+def _decode_move(move: str | None) -> tuple[int, int] | None:
+    if move is None:
+        return None
+    height, items = move.split(",")
+    return int(height), int(items)
@@ -0,0 +1,218 @@
+import sys
+from collections import OrderedDict
+
+from Algorithms.AlgorithmBase import AlgorithmBase, Move, SearchTimeout, measured
+from Algorithms.GameState import GameState
+from Algorithms.Tablebase import Tablebase
+
+# Proof or disproof number of a position that cannot be proven or disproven
+INFINITY: int = 1 << 62
+
+
+class ProofNumberTable:
+    """
+    Bounded table of (phi, delta) of searched positions, keyed on GameState.hash like TranspositionTable.
+    When the table is full, the least recently used entry is evicted.
+    """
+
+    def __init__(self, max_size: int = 1_000_000):
+        self.max_size: int = max_size
+        self.entries: OrderedDict[int, tuple[int, int]] = OrderedDict()
+
+    def probe(self, key: int) -> tuple[int, int] | None:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def store(self, key: int, phi: int, delta: int) -> None:
+        if key in self.entries:
+            self.entries.move_to_end(key)
+        elif len(self.entries) >= self.max_size:
+            self.entries.popitem(last=False)
+        self.entries[key] = (phi, delta)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class ProofNumberAlgorithm(AlgorithmBase):
+    """
+    Depth-first proof-number search (df-pn) - a solver, it searches until the position is proven to be won or lost.
+
+    Every position has a proof number phi (how many leaves at least have to be solved to prove that the player
+    to move wins) and a disproof number delta (the same for proving they lose). In the negamax form
+    phi is the smallest delta of the children and delta is the sum of phi of the children.
+    The search always descends into the child with the smallest delta, and stays in a subtree only while
+    its numbers are below the thresholds given by its parent, so only the (phi, delta) of positions are stored
+    and re-expanding a subtree is cheap thanks to the table.
+
+    The depth of get_move is a budget of NODES_PER_DEPTH nodes per unit - when it runs out,
+    the most promising move is returned unproven. `result` tells if the last position was proven.
+    """
+
+    NODES_PER_DEPTH: int = 10_000
+
+    def __init__(self, table_size: int = 1_000_000, tablebase: Tablebase | None = None):
+        """
+        Args:
+            table_size: limit of positions in the proof number table
+            tablebase: endgame tablebase - positions it covers are proven without a search
+        """
+        super().__init__()
+        self.table: ProofNumberTable = ProofNumberTable(table_size)
+        self.tablebase: Tablebase | None = tablebase
+        # Whether the player to move in the last searched position wins, None if it was not proven
+        self.result: bool | None = None
+        self._nodes_left: int = 0
+        self._root: GameState | None = None
+
+    @measured
+    def get_move(self, stacks: GameState, depth: int) -> Move:
+        """Implement the abstract method from AlgorithmBase"""
+        self._searched_depth = depth
+        return self.prove(stacks, depth * self.NODES_PER_DEPTH)[1]
+
+    def _uses_depth(self) -> bool:
+        return True
+
+    @classmethod
+    def get_name(cls) -> str:
+        return "Proof Number"
+
+    def _search_until_deadline(self, stacks: GameState) -> Move:
+        # Proof numbers of the searched positions are kept, so one search until the deadline does all
+        # that iterative deepening would
+        return self.prove(stacks, sys.maxsize)[1]
+
+    def _predict_reply(self, stacks: GameState) -> Move:
+        return self._choose_move(stacks)[1]
+
+    def prove(self, stacks: GameState, max_nodes: int) -> tuple[bool | None, Move]:
+        """
+        Search the position until it is proven or max_nodes nodes (or the time of a timed move) are used up
+
+        Returns:
+            Whether the player to move wins (None if it was not proven) and the best move found
+        """
+        self._root = stacks
+        self._nodes_left = max_nodes
+        self.stats.iterations += 1
+        try:
+            self._mid(stacks, INFINITY, INFINITY, 0)
+        except SearchTimeout:
+            # The table keeps everything found until the deadline
+            pass
+
+        self.result, move = self._choose_move(stacks)
+        return self.result, move
+
+    def _mid(self, stacks: GameState, phi_threshold: int, delta_threshold: int, ply: int) -> None:
+        """
+        Expand the position until its phi reaches phi_threshold or its delta reaches delta_threshold
+        """
+        self._check_deadline()
+        self.stats.nodes += 1
+        self._nodes_left -= 1
+        self.stats.max_depth = max(self.stats.max_depth, ply)
+
+        children = self._children(stacks)
+        while True:
+            phi = INFINITY
+            delta = 0
+            best_child = None
+            best_phi = 0
+            second_delta = INFINITY
+            for child in children:
+                child_phi, child_delta = self._numbers(child)
+                delta = min(delta + child_phi, INFINITY)
+                if child_delta < phi:
+                    second_delta = phi
+                    phi = child_delta
+                    best_child = child
+                    best_phi = child_phi
+                elif child_delta < second_delta:
+                    second_delta = child_delta
+
+            self.table.store(stacks.hash, phi, delta)
+            if phi >= phi_threshold or delta >= delta_threshold or self._nodes_left <= 0:
+                return
+
+            # The child may take the threshold of its parent, minus what the other children already need
+            self._mid(best_child, min(delta_threshold - delta + best_phi, INFINITY),
+                      min(phi_threshold, second_delta + 1), ply + 1)
+
+    def _numbers(self, stacks: GameState) -> tuple[int, int]:
+        """(phi, delta) of a position - from the table, or the initial estimate of a position not searched yet"""
+        if stacks.is_terminal():
+            # The opponent took the last item
+            self.stats.leaf_evals += 1
+            return 0, INFINITY
+
+        entry = self.table.probe(stacks.hash)
+        if entry is not None:
+            self.stats.tt_hits += 1
+            return entry
+
+        if self.tablebase is not None:
+            win = self.tablebase.probe_win(stacks)
+            if win is not None:
+                self.stats.tablebase_hits += 1
+                return (0, INFINITY) if win else (INFINITY, 0)
+
+        # Disproving needs all moves of the position to be refuted
+        return 1, self._move_count(stacks)
+
+    @staticmethod
+    def _move_count(stacks: GameState) -> int:
+        """Moves that lead to different positions - taking from stacks of the same height is the same move"""
+        return sum(set(stacks))
+
+    @staticmethod
+    def _children(stacks: GameState) -> list[GameState]:
+        children = []
+        seen_heights = set()
+        for stack_index in stacks.non_zero_indices():
+            height = stacks[stack_index]
+            if height in seen_heights:
+                continue
+            seen_heights.add(height)
+            for items in range(1, height + 1):
+                children.append(stacks.after(stack_index, items))
+        return children
+
+    def _choose_move(self, stacks: GameState) -> tuple[bool | None, Move]:
+        """
+        Returns:
+            Whether the player to move wins according to the table (None if it is not proven) and the best move -
+            a move to a lost position if there is one, otherwise the move to the position that looks easiest
+            to disprove
+        """
+        best = None
+        best_numbers = None
+        all_won = True
+        seen_heights = set()
+        for stack_index in stacks.non_zero_indices():
+            height = stacks[stack_index]
+            if height in seen_heights:
+                continue
+            seen_heights.add(height)
+            for items in range(1, height + 1):
+                child_phi, child_delta = self._numbers(stacks.after(stack_index, items))
+                all_won = all_won and child_phi == 0
+                # Smallest delta, the largest phi among those
+                if best_numbers is None or (child_delta, -child_phi) < best_numbers:
+                    best = Move(stack_index=stack_index, items_to_remove=items)
+                    best_numbers = (child_delta, -child_phi)
+
+        if best_numbers[0] == 0:
+            return True, best
+        return (False if all_won else None), best
+
+    def _current_best_move(self) -> Move | None:
+        if self._root is None:
+            return None
+        return self._choose_move(self._root)[1]
@@ -1,16 +1,17 @@
 import random
 
-from Algorithms.AlgorithmBase import AlgorithmBase, Move
+from Algorithms.AlgorithmBase import AlgorithmBase, Move, measured
+from Algorithms.GameState import GameState
 
 
 class Random(AlgorithmBase):
-    def get_move(self, stacks: list[int], depth: int) -> Move:
-        non_zero_indices = [i for i, stack in enumerate(stacks) if stack > 0]
-        non_zero_stacks = [stacks[i] for i in non_zero_indices]
+    @measured
+    def get_move(self, stacks: GameState, depth: int) -> Move:
+        non_zero_indices = stacks.non_zero_indices()
         
-        stack_index = random.randint(0, len(non_zero_stacks) - 1)
-        items_to_remove = random.randint(1, non_zero_stacks[stack_index])
-        return Move(stack_index=non_zero_indices[stack_index], items_to_remove=items_to_remove)
+        stack_index = non_zero_indices[random.randint(0, len(non_zero_indices) - 1)]
+        items_to_remove = random.randint(1, stacks[stack_index])
+        return Move(stack_index=stack_index, items_to_remove=items_to_remove)
     
     @classmethod
     def get_name(cls) -> str:
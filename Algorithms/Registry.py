@@ -0,0 +1,29 @@
+from Algorithms.AlgorithmBase import AlgorithmBase
+from Algorithms.Random import Random
+from Algorithms.Mcts import MctsAlgorithm
+from Algorithms.MctsGraph import MctsGraphAlgorithm
+from Algorithms.AlphaBeta import AlphaBetaAlgorithm
+from Algorithms.ParallelAlphaBeta import ParallelAlphaBetaAlgorithm
+from Algorithms.Optimal import Optimal
+from Algorithms.ProofNumber import ProofNumberAlgorithm
+from Algorithms.ParallelMcts import ParallelMctsAlgorithm, LeafParallelMctsAlgorithm
+
+ALGORITHMS: list[type[AlgorithmBase]] = [
+    Random,
+    MctsAlgorithm,
+    MctsGraphAlgorithm,
+    ParallelMctsAlgorithm,
+    LeafParallelMctsAlgorithm,
+    AlphaBetaAlgorithm,
+    ParallelAlphaBetaAlgorithm,
+    ProofNumberAlgorithm,
+    Optimal,
+]
+
+
+def get_algorithm(name: str) -> type[AlgorithmBase]:
+    for algorithm in ALGORITHMS:
+        if algorithm.get_name() == name:
+            return algorithm
+
+    raise ValueError(f"Unknown algorithm: {name}. Available: {', '.join(a.get_name() for a in ALGORITHMS)}")
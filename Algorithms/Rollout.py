@@ -0,0 +1,90 @@
+import random
+
+# From this many stacks on, finding the chosen stack in a Fenwick tree is faster than a linear scan
+FENWICK_MIN_STACKS: int = 48
+
+
+def simulate_random_game(state: list[int]) -> int:
+    """
+    Play uniformly random moves from the given state until the game ends.
+    Move number r of all (stack_index, items_to_remove) pairs is found by walking the stacks instead of building
+    the list of all moves, so the same random number gives the same move as random.choice over that list.
+
+    Returns:
+        0 if the player to move in the given state wins, 1 if the other player wins
+    """
+    if len(state) >= FENWICK_MIN_STACKS:
+        return _simulate_random_game_fenwick(state)
+
+    state = state.copy()
+    total = sum(state)
+    current_player = 0
+    randrange = random.randrange
+
+    while total > 0:
+        r = randrange(total)
+        for stack_index, stack_size in enumerate(state):
+            if r < stack_size:
+                break
+            r -= stack_size
+
+        state[stack_index] -= r + 1
+        total -= r + 1
+        current_player = 1 - current_player
+
+    # In Misère Nim, the player who takes the last item loses, so the player to move now wins
+    return current_player
+
+
+class FenwickTree:
+    """Prefix sums of stack sizes with O(log n) update and search"""
+
+    def __init__(self, values: list[int]):
+        self.size: int = len(values)
+        self.tree: list[int] = [0] + list(values)
+        for i in range(1, self.size + 1):
+            parent = i + (i & -i)
+            if parent <= self.size:
+                self.tree[parent] += self.tree[i]
+
+        self.top_bit: int = 1
+        while self.top_bit * 2 <= self.size:
+            self.top_bit *= 2
+
+    def add(self, index: int, delta: int) -> None:
+        i = index + 1
+        while i <= self.size:
+            self.tree[i] += delta
+            i += i & -i
+
+    def find(self, r: int) -> tuple[int, int]:
+        """
+        Returns:
+            Index of the value containing position r of the concatenated values, and the offset of r inside it
+        """
+        position = 0
+        step = self.top_bit
+        while step > 0:
+            next_position = position + step
+            if next_position <= self.size and self.tree[next_position] <= r:
+                position = next_position
+                r -= self.tree[next_position]
+            step //= 2
+        return position, r
+
+
+def _simulate_random_game_fenwick(state: list[int]) -> int:
+    state = state.copy()
+    prefix_sums = FenwickTree(state)
+    total = sum(state)
+    current_player = 0
+    randrange = random.randrange
+
+    while total > 0:
+        stack_index, r = prefix_sums.find(randrange(total))
+        state[stack_index] -= r + 1
+        prefix_sums.add(stack_index, -(r + 1))
+        total -= r + 1
+        current_player = 1 - current_player
+
+    return current_player
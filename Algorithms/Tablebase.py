@@ -0,0 +1,196 @@
+"""
+Endgame tablebase - every position with at most K non-empty stacks of at most H items, solved once and stored
+on disk. Run `python -m Algorithms.Tablebase --help` from main directory to generate one.
+"""
+
+import argparse
+import math
+import mmap
+import struct
+import time
+from array import array
+from typing import Iterator
+
+from Algorithms.AlgorithmBase import Move
+
+MAGIC: bytes = b"NIMTB1\0\0"
+# Magic, max stacks, max height, number of positions
+HEADER: struct.Struct = struct.Struct("<8sIIQ")
+RECORD: struct.Struct = struct.Struct("<I")
+
+
+class Tablebase:
+    """
+    Read-only tablebase, memory-mapped so opening it costs nothing and all processes share the same pages.
+
+    Positions are multisets of stack heights, so the order of stacks does not matter. A position is padded with
+    zero stacks to exactly K stacks and ranked in the combinatorial number system - sorted heights
+    a_0 <= ... <= a_{K-1} get rank sum(C(a_i + i, i + 1)), a dense index from 0 to C(H + K, K) - 1.
+
+    Every position has one 32-bit record: bit 0 is set if the player to move wins, the rest is the best move
+    as the height of the stack to take from and the height it is left with.
+    """
+
+    def __init__(self, path: str):
+        self.path: str = path
+        with open(path, "rb") as file:
+            self._mmap: mmap.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+
+        magic, self.max_stacks, self.max_height, self.positions = HEADER.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            self._mmap.close()
+            raise ValueError(f"{path} is not a tablebase")
+        if len(self._mmap) != HEADER.size + self.positions * RECORD.size:
+            self._mmap.close()
+            raise ValueError(f"{path} is truncated")
+
+        self._binomials: list[list[int]] = _binomials(self.max_height + self.max_stacks, self.max_stacks)
+        self._height_bits: int = self.max_height.bit_length()
+
+    def close(self) -> None:
+        self._mmap.close()
+
+    def __len__(self) -> int:
+        return self.positions
+
+    def covers(self, stacks: list[int]) -> bool:
+        non_zero = 0
+        for stack in stacks:
+            if stack > self.max_height:
+                return False
+            if stack > 0:
+                non_zero += 1
+        return non_zero <= self.max_stacks
+
+    def probe(self, stacks: list[int]) -> tuple[bool, Move] | None:
+        """
+        Args:
+            stacks: stack sizes in any order, zeros allowed
+
+        Returns:
+            Whether the player to move wins, and the best move as an index into the given stacks,
+            or None if the position is not in the tablebase or there are no items left
+        """
+        if not self.covers(stacks):
+            return None
+
+        heights = sorted(stack for stack in stacks if stack > 0)
+        if not heights:
+            return None
+
+        padded = [0] * (self.max_stacks - len(heights)) + heights
+        record = RECORD.unpack_from(self._mmap, HEADER.size + RECORD.size * _rank(padded, self._binomials))[0]
+        from_height, to_height = _decode_move(record, self._height_bits)
+        return bool(record & 1), Move(stack_index=stacks.index(from_height), items_to_remove=from_height - to_height)
+
+    def probe_win(self, stacks: list[int]) -> bool | None:
+        """Like probe, but only whether the player to move wins - with no items left that is the player to move"""
+        if not any(stacks):
+            return True
+        result = self.probe(stacks)
+        return None if result is None else result[0]
+
+    @staticmethod
+    def generate(path: str, max_stacks: int, max_height: int) -> None:
+        """
+        Solve every position with at most max_stacks stacks of at most max_height items by retrograde analysis
+        and write the tablebase to the given path.
+
+        Positions are solved in rank order. A move lowers one height, which moves the position down in the order
+        (it compares like the heights sorted from the highest), so every position reachable from a position
+        is already solved when it is reached. A position is won if some move leads to a lost one.
+        """
+        height_bits = max_height.bit_length()
+        if 1 + 2 * height_bits > 32:
+            raise ValueError(f"Heights up to {max_height} do not fit in the 32-bit records")
+
+        binomials = _binomials(max_height + max_stacks, max_stacks)
+        positions = binomials[max_height + max_stacks][max_stacks]
+        records = array("I", bytes(RECORD.size * positions))
+
+        for rank, descending in enumerate(_descending_positions(max_stacks, max_height)):
+            if descending[0] == 0:
+                # No items left - the opponent took the last one
+                records[rank] = 1
+                continue
+
+            heights = descending[::-1]
+            win = False
+            move = (descending[0], descending[0] - 1)
+            previous = -1
+            for i, height in enumerate(heights):
+                if height == previous:
+                    continue
+                previous = height
+
+                for new_height in range(height):
+                    child = heights[:i] + heights[i + 1:]
+                    child.insert(_insert_position(child, new_height), new_height)
+                    if records[_rank(child, binomials)] & 1 == 0:
+                        win = True
+                        move = (height, new_height)
+                        break
+                if win:
+                    break
+
+            records[rank] = int(win) | move[0] << 1 | move[1] << (1 + height_bits)
+
+        with open(path, "wb") as file:
+            file.write(HEADER.pack(MAGIC, max_stacks, max_height, positions))
+            records.tofile(file)
+
+
+def _binomials(n: int, k: int) -> list[list[int]]:
+    """Table of C(i, j) for i <= n, j <= k"""
+    table = [[0] * (k + 1) for _ in range(n + 1)]
+    for i in range(n + 1):
+        table[i][0] = 1
+        for j in range(1, min(i, k) + 1):
+            table[i][j] = table[i - 1][j - 1] + table[i - 1][j]
+    return table
+
+
+def _rank(heights: list[int], binomials: list[list[int]]) -> int:
+    """Rank of sorted heights, padded to the tablebase number of stacks"""
+    return sum(binomials[height + i][i + 1] for i, height in enumerate(heights))
+
+
+def _descending_positions(max_stacks: int, max_height: int) -> Iterator[list[int]]:
+    """All positions as heights sorted from the highest, in rank order"""
+    if max_stacks == 0:
+        yield []
+        return
+
+    for first in range(max_height + 1):
+        for rest in _descending_positions(max_stacks - 1, first):
+            yield [first] + rest
+
+
+def _insert_position(heights: list[int], height: int) -> int:
+    for i, other in enumerate(heights):
+        if other >= height:
+            return i
+    return len(heights)
+
+
+def _decode_move(record: int, height_bits: int) -> tuple[int, int]:
+    mask = (1 << height_bits) - 1
+    return (record >> 1) & mask, (record >> (1 + height_bits)) & mask
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Generate a Nim Misère endgame tablebase")
+    parser.add_argument("output", help="file to write the tablebase to")
+    parser.add_argument("--max-stacks", type=int, required=True, help="most non-empty stacks of a position")
+    parser.add_argument("--max-height", type=int, required=True, help="most items on a stack")
+    args = parser.parse_args()
+
+    positions = math.comb(args.max_height + args.max_stacks, args.max_stacks)
+    print(f"Solving {positions} positions...")
+    start = time.perf_counter()
+    Tablebase.generate(args.output, args.max_stacks, args.max_height)
+    print(f"Done in {time.perf_counter() - start:.1f} s, {HEADER.size + positions * RECORD.size} bytes")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+from collections import OrderedDict
+from dataclasses import dataclass
+from enum import Enum
+from multiprocessing.shared_memory import SharedMemory
+
+import numpy as np
+
+
+class Bound(Enum):
+    EXACT = 0
+    LOWER = 1
+    UPPER = 2
+
+
+@dataclass
+class TTEntry:
+    value: int
+    depth: int
+    bound: Bound
+    # Best move as (stack height, items to remove), so it is valid for every permutation of the position
+    move: tuple[int, int] | None = None
+
+    def is_proven(self) -> bool:
+        """A won or lost result does not depend on the depth it was found at"""
+        return (self.value == 1 and self.bound != Bound.UPPER) or (self.value == -1 and self.bound != Bound.LOWER)
+
+
+class TranspositionTable:
+    """
+    Bounded table of already searched positions.
+    Positions are keyed on GameState.hash - a hash of the multiset of nonzero stacks, as the order of stacks
+    and empty stacks do not change the game. When the table is full, the least recently used entry is evicted.
+    """
+
+    def __init__(self, max_size: int = 1_000_000):
+        self.max_size: int = max_size
+        self.entries: OrderedDict[int, TTEntry] = OrderedDict()
+
+    def probe(self, key: int) -> TTEntry | None:
+        entry = self.entries.get(key)
+        if entry is not None:
+            self.entries.move_to_end(key)
+        return entry
+
+    def store(self, key: int, value: int, depth: int, bound: Bound, move: tuple[int, int] | None = None) -> None:
+        entry = self.entries.get(key)
+        if entry is not None:
+            # Keep the deeper result, unless the new one is a proven win or loss
+            new_entry = TTEntry(value, depth, bound, move)
+            if depth >= entry.depth or new_entry.is_proven():
+                self.entries[key] = new_entry
+            self.entries.move_to_end(key)
+            return
+
+        if len(self.entries) >= self.max_size:
+            self.entries.popitem(last=False)
+        self.entries[key] = TTEntry(value, depth, bound, move)
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+
+class SharedTranspositionTable:
+    """
+    Transposition table in shared memory, with the interface of TranspositionTable, for searches
+    running in several processes at once. Other processes attach to it by its `name`.
+
+    Every slot is four 64-bit words: check, data (occupied bit, value, bound, depth), move height and move items.
+    Slots are written without locks - check is the key XORed with the other three words, so a slot torn by
+    two processes writing it at once fails the check and reads as empty. A key always goes to the same slot,
+    a different key there is replaced. Moves of stacks that do not fit in 64 bits are not stored.
+    """
+
+    SLOT_WORDS: int = 4
+    WORD_MASK: int = (1 << 64) - 1
+
+    def __init__(self, max_size: int = 1_000_000, name: str | None = None):
+        """
+        Args:
+            max_size: number of slots
+            name: name of a table created by another process to attach to - a new table is created if None
+        """
+        self.max_size: int = max_size
+        size = max_size * self.SLOT_WORDS * 8
+        self._owner: bool = name is None
+        # New shared memory is filled with zeros, which are empty slots
+        self._memory: SharedMemory = SharedMemory(name=name, create=self._owner, size=size if self._owner else 0)
+        self.name: str = self._memory.name
+        self._words: memoryview = self._memory.buf.cast('Q')
+
+    def probe(self, key: int) -> TTEntry | None:
+        base = key % self.max_size * self.SLOT_WORDS
+        words = self._words
+        check, data, height, items = words[base], words[base + 1], words[base + 2], words[base + 3]
+        if not data & 1 or check ^ data ^ height ^ items != key:
+            return None
+
+        return TTEntry(value=(data >> 1 & 3) - 1, depth=data >> 5, bound=Bound(data >> 3 & 3),
+                       move=(height, items) if height else None)
+
+    def store(self, key: int, value: int, depth: int, bound: Bound, move: tuple[int, int] | None = None) -> None:
+        entry = self.probe(key)
+        # Keep the deeper result, unless the new one is a proven win or loss
+        if entry is not None and depth < entry.depth and not TTEntry(value, depth, bound, move).is_proven():
+            return
+
+        height, items = move if move is not None and move[0] <= self.WORD_MASK else (0, 0)
+        data = 1 | (value + 1) << 1 | bound.value << 3 | depth << 5
+        base = key % self.max_size * self.SLOT_WORDS
+        words = self._words
+        words[base + 1] = data
+        words[base + 2] = height
+        words[base + 3] = items
+        words[base] = key ^ data ^ height ^ items
+
+    def clear(self) -> None:
+        self._memory.buf[:] = bytes(len(self._memory.buf))
+
+    def __len__(self) -> int:
+        data = np.frombuffer(self._memory.buf, dtype=np.uint64)[1::self.SLOT_WORDS]
+        return int(np.count_nonzero(data & np.uint64(1)))
+
+    def close(self) -> None:
+        """Detach from the table - the process that created it also frees it"""
+        self._words.release()
+        self._memory.close()
+        if self._owner:
+            self._memory.unlink()
@@ -0,0 +1,342 @@
+"""
+Headless arena - plays many games between algorithms in parallel, without the UI.
+Run `python Arena.py --help` from main directory.
+"""
+
+import argparse
+import json
+import math
+import random
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from dataclasses import dataclass, field, fields
+from typing import Iterable, Iterator
+
+from Algorithms.PositionCache import PositionCache
+from Algorithms.Registry import ALGORITHMS, get_algorithm
+from GameHistory import GameHistory
+from GameRecord import GameRecord, GameRecordWriter
+from NimMisere import NimMisere
+
+
+@dataclass
+class GameTask:
+    first_player: str
+    second_player: str
+    stacks: list[int]
+    # Exactly one of depth and time_per_move is used - time_per_move if it is set
+    depth: int = 1
+    time_per_move: float | None = None
+    seed: int = 0
+    # Return the moves of the game too
+    record: bool = False
+    # Position cache file for the algorithms that can use one
+    position_cache: str | None = None
+    # Let the waiting player search on the opponent's time, in timed games
+    pondering: bool = False
+    # Worker processes of every parallel algorithm, their default if None
+    search_workers: int | None = None
+
+
+@dataclass
+class GameResult:
+    first_player: str
+    second_player: str
+    stacks: list[int]
+    first_player_won: bool
+    moves: int
+    first_player_time: float
+    second_player_time: float
+    first_player_nodes: int
+    second_player_nodes: int
+    record: GameRecord | None = field(default=None, repr=False)
+
+    def summary(self) -> dict:
+        """Result without the record, for JSON"""
+        return {result_field.name: getattr(self, result_field.name)
+                for result_field in fields(self) if result_field.name != "record"}
+
+
+def play_game(task: GameTask) -> GameResult:
+    """Play a single game - runs in the worker processes"""
+    random.seed(task.seed)
+    players = [get_algorithm(task.first_player)(), get_algorithm(task.second_player)()]
+    position_cache = PositionCache(task.position_cache) if task.position_cache is not None else None
+    for algorithm in players:
+        if hasattr(algorithm, "position_cache"):
+            algorithm.position_cache = position_cache
+        if task.search_workers is not None and hasattr(algorithm, "workers"):
+            algorithm.workers = task.search_workers
+
+    game = NimMisere(list(task.stacks), players[0], players[1])
+    game.pondering = task.pondering
+    history = GameHistory(game) if task.record else None
+    stepper = history if history is not None else game
+
+    times = [0.0, 0.0]
+    nodes = [0, 0]
+    moves = 0
+    try:
+        while game.get_result() is None:
+            player = 0 if game.first_player_turn else 1
+
+            if task.time_per_move is not None:
+                stepper.step_timed(task.time_per_move)
+            else:
+                stepper.step(task.depth)
+            times[player] += game.last_stats.wall_time
+            nodes[player] += game.last_stats.nodes
+            moves += 1
+    finally:
+        for algorithm in players:
+            algorithm.close()
+        if position_cache is not None:
+            position_cache.close()
+
+    return GameResult(
+        first_player=task.first_player,
+        second_player=task.second_player,
+        stacks=list(task.stacks),
+        first_player_won=game.get_result(),
+        moves=moves,
+        first_player_time=times[0],
+        second_player_time=times[1],
+        first_player_nodes=nodes[0],
+        second_player_nodes=nodes[1],
+        record=GameRecord.from_history(history) if history is not None else None)
+
+
+def generate_positions(count: int, max_stacks: int, max_height: int, seed: int, min_stacks: int = 1) -> list[list[int]]:
+    rng = random.Random(seed)
+    return [[rng.randint(1, max_height) for _ in range(rng.randint(min_stacks, max_stacks))] for _ in range(count)]
+
+
+def _pairing_tasks(first: str, second: str, positions: list[list[int]], games_per_position: int, depth: int,
+                   time_per_move: float | None) -> list[GameTask]:
+    """Both algorithms start every position the same number of times"""
+    return [GameTask(a, b, position, depth, time_per_move)
+            for position in positions
+            for _ in range(games_per_position)
+            for a, b in ((first, second), (second, first))]
+
+
+def round_robin(algorithms: list[str], positions: list[list[int]], games_per_position: int = 1, depth: int = 1,
+                time_per_move: float | None = None, seed: int = 0) -> list[GameTask]:
+    tasks = [task
+             for i, first in enumerate(algorithms)
+             for second in algorithms[i + 1:]
+             for task in _pairing_tasks(first, second, positions, games_per_position, depth, time_per_move)]
+    return _seeded(tasks, seed)
+
+
+def gauntlet(challenger: str, opponents: list[str], positions: list[list[int]], games_per_position: int = 1,
+             depth: int = 1, time_per_move: float | None = None, seed: int = 0) -> list[GameTask]:
+    tasks = [task
+             for opponent in opponents
+             for task in _pairing_tasks(challenger, opponent, positions, games_per_position, depth, time_per_move)]
+    return _seeded(tasks, seed)
+
+
+def uneven_pondering(tasks: list[GameTask]) -> list[tuple[str, str]]:
+    """
+    Pairings in which only one algorithm can ponder - pondering runs in a thread of the same process,
+    so it takes CPU from the search of the other one instead of adding time.
+    """
+    can_ponder = {}
+    for name in {name for task in tasks for name in (task.first_player, task.second_player)}:
+        algorithm = get_algorithm(name)()
+        try:
+            can_ponder[name] = algorithm.can_ponder()
+        finally:
+            algorithm.close()
+
+    pairings = {tuple(sorted((task.first_player, task.second_player))) for task in tasks}
+    return sorted(pairing for pairing in pairings if can_ponder[pairing[0]] != can_ponder[pairing[1]])
+
+
+def _seeded(tasks: list[GameTask], seed: int) -> list[GameTask]:
+    for i, task in enumerate(tasks):
+        task.seed = seed * 1_000_003 + i
+    return tasks
+
+
+def run_games(tasks: Iterable[GameTask], workers: int | None = None) -> Iterator[GameResult]:
+    """
+    Play the games in a process pool and yield their results as soon as they finish
+
+    Args:
+        tasks: games to play
+        workers: number of worker processes, all CPUs by default - 1 plays the games in this process
+    """
+    if workers == 1:
+        for task in tasks:
+            yield play_game(task)
+        return
+
+    with ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(play_game, task) for task in tasks]
+        for future in as_completed(futures):
+            yield future.result()
+
+
+def wilson_interval(wins: int, games: int, z: float = 1.96) -> tuple[float, float]:
+    """Confidence interval of a win rate (95% by default)"""
+    if games == 0:
+        return 0.0, 1.0
+
+    rate = wins / games
+    denominator = 1 + z * z / games
+    center = (rate + z * z / (2 * games)) / denominator
+    margin = z * math.sqrt(rate * (1 - rate) / games + z * z / (4 * games * games)) / denominator
+    return max(0.0, center - margin), min(1.0, center + margin)
+
+
+@dataclass
+class Score:
+    games: int = 0
+    wins: int = 0
+    moves: int = 0
+    move_time: float = 0.0
+    nodes: int = 0
+
+    @property
+    def win_rate(self) -> float:
+        return self.wins / self.games if self.games else 0.0
+
+    @property
+    def confidence_interval(self) -> tuple[float, float]:
+        return wilson_interval(self.wins, self.games)
+
+    @property
+    def average_move_time(self) -> float:
+        return self.move_time / self.moves if self.moves else 0.0
+
+    @property
+    def average_nodes(self) -> float:
+        return self.nodes / self.moves if self.moves else 0.0
+
+    def add(self, won: bool, moves: int, move_time: float, nodes: int) -> None:
+        self.games += 1
+        self.wins += int(won)
+        self.moves += moves
+        self.move_time += move_time
+        self.nodes += nodes
+
+
+class ArenaReport:
+    """Scores of every algorithm, overall and against every opponent, updated one game at a time"""
+
+    def __init__(self):
+        self.scores: dict[str, Score] = {}
+        self.pairings: dict[tuple[str, str], Score] = {}
+
+    def add(self, result: GameResult) -> None:
+        first_moves = (result.moves + 1) // 2
+        second_moves = result.moves // 2
+        sides = [
+            (result.first_player, result.second_player, result.first_player_won, first_moves,
+             result.first_player_time, result.first_player_nodes),
+            (result.second_player, result.first_player, not result.first_player_won, second_moves,
+             result.second_player_time, result.second_player_nodes),
+        ]
+        for name, opponent, won, moves, move_time, nodes in sides:
+            self.scores.setdefault(name, Score()).add(won, moves, move_time, nodes)
+            self.pairings.setdefault((name, opponent), Score()).add(won, moves, move_time, nodes)
+
+    def summary(self) -> str:
+        lines = [f"{'Algorithm':<24} {'Games':>7} {'Win rate':>9} {'95% CI':>15} {'Move [ms]':>10} {'Nodes/move':>11}"]
+        for name, score in sorted(self.scores.items(), key=lambda item: -item[1].win_rate):
+            low, high = score.confidence_interval
+            lines.append(f"{name:<24} {score.games:>7} {score.win_rate:>9.3f} {f'{low:.3f}-{high:.3f}':>15} "
+                         f"{score.average_move_time * 1000:>10.2f} {score.average_nodes:>11.1f}")
+
+        lines.append("")
+        lines.append(f"{'Algorithm':<24} {'Opponent':<24} {'Games':>7} {'Win rate':>9} {'95% CI':>15}")
+        for (name, opponent), score in sorted(self.pairings.items()):
+            low, high = score.confidence_interval
+            lines.append(f"{name:<24} {opponent:<24} {score.games:>7} {score.win_rate:>9.3f} {f'{low:.3f}-{high:.3f}':>15}")
+
+        return "\n".join(lines)
+
+
+def _parse_position(text: str) -> list[int]:
+    position = [int(size.strip()) for size in text.split(",") if size.strip()]
+    if not position or any(size <= 0 for size in position):
+        raise argparse.ArgumentTypeError(f"Invalid position: {text}")
+    return position
+
+
+def main() -> None:
+    names = [algorithm.get_name() for algorithm in ALGORITHMS]
+    parser = argparse.ArgumentParser(description="Play many Nim Misère games between algorithms")
+    parser.add_argument("--algorithms", nargs="+", required=True, choices=names, help="algorithms to play")
+    parser.add_argument("--gauntlet", choices=names,
+                        help="play only this algorithm against all the others instead of a round robin")
+    parser.add_argument("--positions", nargs="+", type=_parse_position, default=[],
+                        help="starting positions as comma separated stack sizes")
+    parser.add_argument("--random-positions", type=int, default=0, help="number of random starting positions to add")
+    parser.add_argument("--max-stacks", type=int, default=5, help="most stacks in random positions")
+    parser.add_argument("--max-height", type=int, default=7, help="highest stack in random positions")
+    parser.add_argument("--games-per-position", type=int, default=1,
+                        help="games per position, pairing and starting side")
+    parser.add_argument("--depth", type=int, default=1, help="depth (or iterations) for every move")
+    parser.add_argument("--time", type=float, help="time limit for every move in seconds, used instead of depth")
+    parser.add_argument("--ponder", action="store_true",
+                        help="let the waiting player think on the opponent's time (timed games only). It runs in "
+                             "a thread of the same process, so it shares the CPU with the opponent's search "
+                             "instead of adding thinking time - both algorithms of every pairing must be able to "
+                             "ponder")
+    parser.add_argument("--workers", type=int, help="number of worker processes, all CPUs by default")
+    parser.add_argument("--search-workers", type=int,
+                        help="worker processes of every parallel algorithm (in every game), all CPUs by default")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="file to stream the results of single games to, as JSON lines")
+    parser.add_argument("--record", help="game record file to append the moves of every game to")
+    parser.add_argument("--position-cache",
+                        help="SQLite file of proven positions, shared by all games and kept for the next runs")
+    args = parser.parse_args()
+
+    positions = args.positions + generate_positions(args.random_positions, args.max_stacks, args.max_height, args.seed)
+    if not positions:
+        parser.error("No starting positions - use --positions or --random-positions")
+
+    if args.gauntlet is not None:
+        opponents = [name for name in args.algorithms if name != args.gauntlet]
+        tasks = gauntlet(args.gauntlet, opponents, positions, args.games_per_position, args.depth, args.time, args.seed)
+    else:
+        tasks = round_robin(args.algorithms, positions, args.games_per_position, args.depth, args.time, args.seed)
+    if args.ponder and args.time is not None:
+        uneven = uneven_pondering(tasks)
+        if uneven:
+            parser.error("--ponder would take time from the algorithm that cannot ponder in: "
+                         + ", ".join(f"{first} vs {second}" for first, second in uneven))
+    for task in tasks:
+        task.record = args.record is not None
+        task.position_cache = args.position_cache
+        task.pondering = args.ponder
+        task.search_workers = args.search_workers
+
+    report = ArenaReport()
+    output = open(args.output, "w") if args.output else None
+    record_writer = GameRecordWriter(args.record) if args.record else None
+    try:
+        for played, result in enumerate(run_games(tasks, args.workers), start=1):
+            report.add(result)
+            if output is not None:
+                output.write(json.dumps(result.summary()) + "\n")
+                output.flush()
+            if record_writer is not None:
+                record_writer.write(result.record)
+            print(f"\rPlayed {played}/{len(tasks)} games", end="", flush=True)
+    finally:
+        if output is not None:
+            output.close()
+        if record_writer is not None:
+            record_writer.close()
+
+    print()
+    print(report.summary())
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,259 @@
+"""
+Benchmark of the move computation of every algorithm on fixed, seeded positions.
+Run `python Benchmark.py run --help` and `python Benchmark.py compare --help` from main directory.
+"""
+
+import argparse
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from dataclasses import dataclass, field
+from typing import Callable
+
+from Algorithms.AlgorithmBase import AlgorithmBase
+from Algorithms.AlphaBeta import AlphaBetaAlgorithm
+from Algorithms.Mcts import MctsAlgorithm
+from Algorithms.Optimal import Optimal
+from Algorithms.ParallelAlphaBeta import ParallelAlphaBetaAlgorithm
+from Algorithms.ProofNumber import ProofNumberAlgorithm
+from Algorithms.Random import Random
+
+
+@dataclass
+class PositionSet:
+    name: str
+    count: int
+    min_stacks: int
+    max_stacks: int
+    max_height: int
+
+    def generate(self, seed: int) -> list[list[int]]:
+        rng = random.Random(f"{seed}/{self.name}")
+        return [[rng.randint(1, self.max_height) for _ in range(rng.randint(self.min_stacks, self.max_stacks))]
+                for _ in range(self.count)]
+
+
+POSITION_SETS: list[PositionSet] = [
+    PositionSet("small", 50, 2, 4, 7),
+    PositionSet("medium", 30, 5, 8, 15),
+    PositionSet("large", 20, 10, 14, 63),
+    PositionSet("tall", 20, 2, 4, 100_000),
+]
+
+
+@dataclass
+class BenchmarkConfig:
+    name: str
+    create: Callable[[], AlgorithmBase]
+    depth: int
+    # Position sets the algorithm can finish in reasonable time at this depth
+    sets: list[str] = field(default_factory=lambda: [position_set.name for position_set in POSITION_SETS])
+
+
+CONFIGS: list[BenchmarkConfig] = [
+    BenchmarkConfig("Random", Random, 0),
+    BenchmarkConfig("Optimal", Optimal, 0),
+    BenchmarkConfig("AlphaBeta", AlphaBetaAlgorithm, 3, ["small", "medium"]),
+    BenchmarkConfig("AlphaBeta-depth-2", AlphaBetaAlgorithm, 2, ["small", "medium", "large"]),
+    BenchmarkConfig("ProofNumber", ProofNumberAlgorithm, 1, ["small"]),
+    BenchmarkConfig("MCTS", MctsAlgorithm, 1000),
+    BenchmarkConfig("MCTS-batch-rollouts", lambda: MctsAlgorithm(rollouts_per_leaf=64), 100),
+]
+
+# Metrics where a higher value is a regression, the rest are regressions when lower
+LOWER_IS_BETTER: set[str] = {"latency_p50", "latency_p90", "latency_p99", "latency_max", "peak_memory"}
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, max(0, round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+def benchmark(config: BenchmarkConfig, positions: list[list[int]], repeat: int, seed: int) -> dict[str, float]:
+    """
+    Every position is searched by a new instance of the algorithm, so nothing is carried over between them.
+    Peak memory is measured in a separate pass, as tracing allocations slows everything down.
+    """
+    random.seed(seed)
+    latencies = []
+    nodes = 0
+    rollouts = 0
+    for _ in range(repeat):
+        for position in positions:
+            algorithm = config.create()
+            algorithm.get_move(list(position), config.depth)
+            latencies.append(algorithm.stats.wall_time)
+
+            nodes += algorithm.stats.nodes
+            rollouts += algorithm.stats.rollouts
+            algorithm.close()
+
+    random.seed(seed)
+    tracemalloc.start()
+    for position in positions:
+        algorithm = config.create()
+        algorithm.get_move(list(position), config.depth)
+        algorithm.close()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    total_time = sum(latencies)
+    latencies.sort()
+    return {
+        "moves": len(latencies),
+        "latency_p50": percentile(latencies, 0.5),
+        "latency_p90": percentile(latencies, 0.9),
+        "latency_p99": percentile(latencies, 0.99),
+        "latency_max": latencies[-1],
+        "nodes_per_second": nodes / total_time if total_time > 0 else 0.0,
+        "rollouts_per_second": rollouts / total_time if total_time > 0 else 0.0,
+        "peak_memory": peak_memory,
+    }
+
+
+def run(args: argparse.Namespace) -> None:
+    configs = [config for config in CONFIGS if not args.algorithms or config.name in args.algorithms]
+    position_sets = [position_set for position_set in POSITION_SETS if not args.sets or position_set.name in args.sets]
+
+    results = {}
+    for config in configs:
+        for position_set in position_sets:
+            if position_set.name not in config.sets:
+                continue
+
+            key = f"{config.name}/{position_set.name}"
+            print(f"{key}...", end="", flush=True)
+            results[key] = benchmark(config, position_set.generate(args.seed), args.repeat, args.seed)
+            print(f" p50 {results[key]['latency_p50'] * 1000:.2f} ms, "
+                  f"{results[key]['nodes_per_second']:.0f} nodes/s, "
+                  f"peak {results[key]['peak_memory'] / 1024:.0f} KiB")
+
+    report = {
+        "meta": {
+            "seed": args.seed,
+            "repeat": args.repeat,
+            "python": sys.version.split()[0],
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        },
+        "results": results,
+    }
+    with open(args.output, "w") as output:
+        json.dump(report, output, indent=2)
+    print(f"Results saved to {args.output}")
+
+    if args.baseline:
+        regressions = compare_files(args.baseline, args.output, args.threshold)
+        sys.exit(1 if regressions else 0)
+
+
+def speedup(args: argparse.Namespace) -> None:
+    """
+    Time of the single process AlphaBeta against Lazy SMP with every given number of workers on the same positions.
+    The worker processes are started before the measurement and the shared table is cleared before every position,
+    so nothing but the search itself is timed.
+    """
+    position_sets = [position_set for position_set in POSITION_SETS if position_set.name in args.sets]
+    for position_set in position_sets:
+        positions = position_set.generate(args.seed)
+
+        single_time = 0.0
+        for position in positions:
+            algorithm = AlphaBetaAlgorithm()
+            algorithm.get_move(list(position), args.depth)
+            single_time += algorithm.stats.wall_time
+        print(f"{position_set.name}: AlphaBeta {single_time * 1000:.1f} ms")
+
+        for workers in args.workers:
+            algorithm = ParallelAlphaBetaAlgorithm(workers=workers)
+            try:
+                algorithm.get_move([1, 2, 3], 1)
+                parallel_time = 0.0
+                for position in positions:
+                    algorithm.transposition_table.clear()
+                    algorithm.get_move(list(position), args.depth)
+                    parallel_time += algorithm.stats.wall_time
+            finally:
+                algorithm.close()
+            print(f"{position_set.name}: Lazy SMP with {workers} workers {parallel_time * 1000:.1f} ms, "
+                  f"speedup {single_time / parallel_time:.2f}x")
+
+
+def compare_results(baseline: dict, current: dict, threshold: float) -> list[str]:
+    """
+    Returns:
+        Description of every metric that got worse by more than the threshold (relative)
+    """
+    regressions = []
+    for key, metrics in current["results"].items():
+        if key not in baseline["results"]:
+            continue
+
+        for metric, value in metrics.items():
+            old_value = baseline["results"][key].get(metric)
+            if metric == "moves" or not old_value:
+                continue
+
+            change = (value - old_value) / old_value
+            if (change > threshold) if metric in LOWER_IS_BETTER else (change < -threshold):
+                regressions.append(f"{key} {metric}: {old_value:.6g} -> {value:.6g} ({change:+.1%})")
+
+    return regressions
+
+
+def compare_files(baseline_path: str, current_path: str, threshold: float) -> list[str]:
+    with open(baseline_path) as baseline_file, open(current_path) as current_file:
+        regressions = compare_results(json.load(baseline_file), json.load(current_file), threshold)
+
+    if regressions:
+        print(f"Regressions over {threshold:.0%}:")
+        for regression in regressions:
+            print(f"  {regression}")
+    else:
+        print(f"No regressions over {threshold:.0%}")
+
+    return regressions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Benchmark the Nim Misère algorithms")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    run_parser = subparsers.add_parser("run", help="run the benchmark and save the results as JSON")
+    run_parser.add_argument("--algorithms", nargs="+", choices=[config.name for config in CONFIGS])
+    run_parser.add_argument("--sets", nargs="+", choices=[position_set.name for position_set in POSITION_SETS])
+    run_parser.add_argument("--repeat", type=int, default=1, help="how many times every position is searched")
+    run_parser.add_argument("--seed", type=int, default=0)
+    run_parser.add_argument("--output", default="benchmark.json")
+    run_parser.add_argument("--baseline", help="results to compare with - exits with 1 on regressions")
+    run_parser.add_argument("--threshold", type=float, default=0.1, help="relative change counted as regression")
+
+    compare_parser = subparsers.add_parser("compare", help="compare two saved results")
+    compare_parser.add_argument("baseline")
+    compare_parser.add_argument("current")
+    compare_parser.add_argument("--threshold", type=float, default=0.1, help="relative change counted as regression")
+
+    speedup_parser = subparsers.add_parser("speedup", help="compare AlphaBeta with its Lazy SMP version")
+    speedup_parser.add_argument("--sets", nargs="+", choices=[position_set.name for position_set in POSITION_SETS],
+                                default=["small", "medium"])
+    speedup_parser.add_argument("--depth", type=int, default=3)
+    speedup_parser.add_argument("--workers", nargs="+", type=int, default=[1, 2, 4])
+    speedup_parser.add_argument("--seed", type=int, default=0)
+
+    args = parser.parse_args()
+    if args.command == "run":
+        run(args)
+    elif args.command == "speedup":
+        speedup(args)
+    else:
+        sys.exit(1 if compare_files(args.baseline, args.current, args.threshold) else 0)
+
+
+if __name__ == "__main__":
+    main()
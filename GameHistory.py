@@ -1,43 +1,104 @@
-from Algorithms.AlgorithmBase import Move
+from array import array
+
+from Algorithms.AlgorithmBase import Move, SearchStats
 from NimMisere import NimMisere
 
 
 class GameHistory:
+    """
+    Moves of a game with a cursor that can be moved back and forth through them.
+    Stepping forward while behind the game replays the next recorded move instead of computing a new one.
+
+    Moves are kept in typed arrays. The stacks at the cursor are kept up to date one move at a time,
+    and a snapshot of the stacks is stored every SNAPSHOT_INTERVAL moves, so any ply can be reached
+    by replaying fewer than SNAPSHOT_INTERVAL moves.
+    """
+
+    SNAPSHOT_INTERVAL: int = 1024
+
     def __init__(self, game: NimMisere):
         self.game: NimMisere = game
-        self.history: list[Move] = []
-        self.behind_by: int = 0
+        self.stack_indices: array = array('q')
+        self.items_removed: array = array('q')
+        self.stats: list[SearchStats] = []
+
+        # Stacks at the cursor, the cursor is the number of moves applied to them
+        self._stacks: list[int] = list(game.state)
+        self.cursor: int = 0
+        # Stacks after every SNAPSHOT_INTERVAL-th move
+        self._snapshots: list[tuple[int, ...]] = [tuple(game.state)]
+
+    def __len__(self) -> int:
+        """Number of moves played in the game"""
+        return len(self.stack_indices)
+
+    @property
+    def behind_by(self) -> int:
+        """How many moves the cursor is behind the game"""
+        return len(self) - self.cursor
+
+    def get_move(self, ply: int) -> Move:
+        """Move number `ply` of the game, from 0"""
+        return Move(stack_index=self.stack_indices[ply], items_to_remove=self.items_removed[ply])
 
     def step(self, depth: int) -> None:
         if self.behind_by > 0:
-            self.behind_by -= 1
+            self._redo()
             return
-        
+
         move = self.game.step(depth)
-        self.history.append(move)
+        self._record(move)
 
     def step_timed(self, time_in_seconds: float) -> None:
         if self.behind_by > 0:
-            self.behind_by -= 1
+            self._redo()
             return
-        
+
         move = self.game.step_timed(time_in_seconds)
-        self.history.append(move)
+        self._record(move)
 
     def get_stacks(self) -> list[int]:
-        stacks = self.game.stacks.copy()
-        for move in list(reversed(self.history))[:self.behind_by]:
-            stacks = self._revert_move(stacks, move)
-            
-        return stacks
-    
+        """Stacks at the cursor"""
+        return self._stacks.copy()
+
     def step_back(self) -> None:
-        if self.behind_by >= len(self.history):
+        if self.cursor == 0:
+            return
+
+        self.cursor -= 1
+        self._stacks[self.stack_indices[self.cursor]] += self.items_removed[self.cursor]
+
+    def jump_to(self, ply: int) -> None:
+        """
+        Move the cursor to the position after `ply` moves - from the cursor or from the closest snapshot,
+        whichever needs fewer moves to be replayed.
+        """
+        if not 0 <= ply <= len(self):
+            raise IndexError(f"Ply {ply} out of range 0..{len(self)}")
+
+        snapshot = ply // self.SNAPSHOT_INTERVAL
+        if abs(ply - self.cursor) > ply - snapshot * self.SNAPSHOT_INTERVAL:
+            self._stacks = list(self._snapshots[snapshot])
+            self.cursor = snapshot * self.SNAPSHOT_INTERVAL
+
+        while self.cursor < ply:
+            self._redo()
+        while self.cursor > ply:
+            self.step_back()
+
+    def _record(self, move: Move | None) -> None:
+        if move is None:
+            # The game is already over
             return
-        
-        self.behind_by += 1
-    
-    @staticmethod
-    def _revert_move(stacks: list[int], move: Move) -> list[int]:
-        stacks[move.stack_index] += move.items_to_remove
-        return stacks
+
+        self.stack_indices.append(move.stack_index)
+        self.items_removed.append(move.items_to_remove)
+        self.stats.append(self.game.last_stats)
+        self._redo()
+
+        if self.cursor % self.SNAPSHOT_INTERVAL == 0:
+            self._snapshots.append(tuple(self._stacks))
+
+    def _redo(self) -> None:
+        self._stacks[self.stack_indices[self.cursor]] -= self.items_removed[self.cursor]
+        self.cursor += 1
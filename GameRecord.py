@@ -0,0 +1,324 @@
+"""
+Compact binary records of played games - an append-only file of games with varint encoded moves.
+
+File layout:
+    magic, then the names and types of the stored SearchStats fields (so files stay readable when fields are added)
+    every game: its length in bytes, flags, names of the players, starting stacks, moves and optionally stats of every move
+All integers are unsigned LEB128 varints, so stacks of any size are stored in as few bytes as they need.
+"""
+
+import mmap
+import os
+import struct
+from array import array
+from dataclasses import dataclass, field, fields
+from typing import Iterator
+
+from Algorithms.AlgorithmBase import AlgorithmBase, Move, SearchStats
+from Algorithms.GameState import GameState
+from GameHistory import GameHistory
+from NimMisere import NimMisere
+
+MAGIC: bytes = b"NIMGR1\0\0"
+FLOAT: struct.Struct = struct.Struct("<d")
+
+FLAG_FINISHED: int = 1
+FLAG_FIRST_PLAYER_WON: int = 2
+FLAG_STATS: int = 4
+
+
+def encode_varint(value: int, output: bytearray) -> None:
+    if value < 0:
+        raise ValueError(f"Cannot encode negative value {value}")
+    while value >= 0x80:
+        output.append(value & 0x7F | 0x80)
+        value >>= 7
+    output.append(value)
+
+
+def decode_varint(buffer, offset: int) -> tuple[int, int]:
+    """
+    Returns:
+        The value and the offset right after it
+    """
+    value = 0
+    shift = 0
+    while True:
+        byte = buffer[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, offset
+        shift += 7
+
+
+def _encode_string(text: str, output: bytearray) -> None:
+    data = text.encode()
+    encode_varint(len(data), output)
+    output += data
+
+
+def _decode_string(buffer, offset: int) -> tuple[str, int]:
+    length, offset = decode_varint(buffer, offset)
+    return bytes(buffer[offset:offset + length]).decode(), offset + length
+
+
+@dataclass
+class GameRecord:
+    first_player: str
+    second_player: str
+    stacks: list[int]
+    stack_indices: array = field(default_factory=lambda: array('q'))
+    items_removed: array = field(default_factory=lambda: array('q'))
+    # True if the first player won, None if the game was not finished
+    first_player_won: bool | None = None
+    # Stats of every move, if they were recorded
+    stats: list[SearchStats] | None = None
+
+    def __len__(self) -> int:
+        return len(self.stack_indices)
+
+    def moves(self) -> Iterator[Move]:
+        for stack_index, items in zip(self.stack_indices, self.items_removed):
+            yield Move(stack_index=stack_index, items_to_remove=items)
+
+    @staticmethod
+    def from_history(history: GameHistory, with_stats: bool = True) -> 'GameRecord':
+        """Record of all moves of the game, regardless of where the cursor of the history is"""
+        game = history.game
+        stacks = list(game.state)
+        for stack_index, items in zip(history.stack_indices, history.items_removed):
+            stacks[stack_index] += items
+
+        return GameRecord(
+            first_player=game.first_player.get_name(),
+            second_player=game.second_player.get_name(),
+            stacks=stacks,
+            stack_indices=array('q', history.stack_indices),
+            items_removed=array('q', history.items_removed),
+            first_player_won=game.get_result(),
+            stats=list(history.stats) if with_stats else None)
+
+    def to_history(self) -> GameHistory:
+        """Replay the game into a new history, with players that repeat the recorded moves"""
+        moves = self.moves()
+        stats = iter(self.stats) if self.stats is not None else None
+        game = NimMisere(list(self.stacks), _RecordedPlayer(self.first_player, moves, stats),
+                         _RecordedPlayer(self.second_player, moves, stats))
+
+        history = GameHistory(game)
+        for _ in range(len(self)):
+            history.step(0)
+        return history
+
+
+class _RecordedPlayer(AlgorithmBase):
+    """Plays the next move of a recorded game - both players share the moves, so they take turns on them"""
+
+    def __init__(self, name: str, moves: Iterator[Move], stats: Iterator[SearchStats] | None):
+        super().__init__()
+        self.name: str = name
+        self.moves: Iterator[Move] = moves
+        self.recorded_stats: Iterator[SearchStats] | None = stats
+
+    def get_move(self, stacks: GameState, depth: int) -> Move:
+        # Not @measured - the stats are the recorded ones
+        self.stats = next(self.recorded_stats) if self.recorded_stats is not None else SearchStats()
+        return next(self.moves)
+
+    def get_name(self) -> str:
+        return self.name
+
+    def _uses_depth(self) -> bool:
+        return False
+
+
+def _stats_fields() -> list[tuple[str, str]]:
+    """Stored SearchStats fields as (name, 'i' or 'f')"""
+    return [(stats_field.name, 'f' if stats_field.type in (float, 'float') else 'i') for stats_field in fields(SearchStats)]
+
+
+def _decode_stats_fields(buffer, offset: int) -> tuple[list[tuple[str, str]], int]:
+    """
+    Returns:
+        Stats fields stored in the header and the offset of the first game
+    """
+    count, offset = decode_varint(buffer, offset)
+    stats_fields = []
+    for _ in range(count):
+        name, offset = _decode_string(buffer, offset)
+        stats_fields.append((name, chr(buffer[offset])))
+        offset += 1
+    return stats_fields, offset
+
+
+def _read_stats_fields(path: str) -> list[tuple[str, str]]:
+    """Stats fields of an existing record file"""
+    with open(path, "rb") as file, mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        if buffer[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a game record file")
+        try:
+            return _decode_stats_fields(buffer, len(MAGIC))[0]
+        except IndexError:
+            raise ValueError(f"{path} has a truncated header") from None
+
+
+class GameRecordWriter:
+    """
+    Appends games to a record file through a large buffer.
+    Use as a context manager, or call close() to flush the buffer.
+    """
+
+    def __init__(self, path: str, buffer_size: int = 1 << 20):
+        # Stats of games appended to an existing file are written in the fields of its header,
+        # so that files from older versions stay readable
+        existing_fields = _read_stats_fields(path) if os.path.exists(path) and os.path.getsize(path) > 0 else None
+
+        self.file = open(path, "ab", buffering=buffer_size)
+        self._stats_fields: list[tuple[str, str]] = existing_fields if existing_fields is not None else _stats_fields()
+        if existing_fields is None:
+            header = bytearray(MAGIC)
+            encode_varint(len(self._stats_fields), header)
+            for name, kind in self._stats_fields:
+                _encode_string(name, header)
+                header += kind.encode()
+            self.file.write(header)
+
+    def write(self, record: GameRecord) -> None:
+        body = bytearray()
+        flags = 0
+        if record.first_player_won is not None:
+            flags |= FLAG_FINISHED
+            if record.first_player_won:
+                flags |= FLAG_FIRST_PLAYER_WON
+        if record.stats is not None:
+            flags |= FLAG_STATS
+        body.append(flags)
+
+        _encode_string(record.first_player, body)
+        _encode_string(record.second_player, body)
+        encode_varint(len(record.stacks), body)
+        for stack in record.stacks:
+            encode_varint(stack, body)
+
+        encode_varint(len(record), body)
+        for stack_index, items in zip(record.stack_indices, record.items_removed):
+            encode_varint(stack_index, body)
+            encode_varint(items, body)
+
+        if record.stats is not None:
+            for stats in record.stats:
+                for name, kind in self._stats_fields:
+                    # Fields of an older version this one does not have anymore are written as 0
+                    value = getattr(stats, name, 0)
+                    if kind == 'f':
+                        body += FLOAT.pack(value)
+                    else:
+                        encode_varint(value, body)
+
+        length = bytearray()
+        encode_varint(len(body), length)
+        self.file.write(length)
+        self.file.write(body)
+
+    def write_history(self, history: GameHistory, with_stats: bool = True) -> None:
+        self.write(GameRecord.from_history(history, with_stats))
+
+    def close(self) -> None:
+        self.file.close()
+
+    def __enter__(self) -> 'GameRecordWriter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class GameRecordReader:
+    """
+    Reads games from a record file, memory-mapped - a game is decoded only when it is reached,
+    straight from the mapped pages.
+    """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as file:
+            self._mmap: mmap.mmap = mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ)
+        self._buffer: memoryview = memoryview(self._mmap)
+
+        if bytes(self._buffer[:len(MAGIC)]) != MAGIC:
+            self.close()
+            raise ValueError(f"{path} is not a game record file")
+
+        self._stats_fields: list[tuple[str, str]]
+        self._stats_fields, self._first_game = _decode_stats_fields(self._buffer, len(MAGIC))
+        self._known_fields: set[str] = {stats_field.name for stats_field in fields(SearchStats)}
+
+    def close(self) -> None:
+        self._buffer.release()
+        self._mmap.close()
+
+    def __enter__(self) -> 'GameRecordReader':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def offsets(self) -> Iterator[int]:
+        """Offset of every game, found by skipping over the games without decoding them"""
+        offset = self._first_game
+        while offset < len(self._buffer):
+            yield offset
+            length, body = decode_varint(self._buffer, offset)
+            offset = body + length
+
+    def __iter__(self) -> Iterator[GameRecord]:
+        for offset in self.offsets():
+            yield self.read_at(offset)
+
+    def read_at(self, offset: int) -> GameRecord:
+        buffer = self._buffer
+        _, offset = decode_varint(buffer, offset)
+        flags = buffer[offset]
+        offset += 1
+
+        first_player, offset = _decode_string(buffer, offset)
+        second_player, offset = _decode_string(buffer, offset)
+        stacks_count, offset = decode_varint(buffer, offset)
+        stacks = []
+        for _ in range(stacks_count):
+            stack, offset = decode_varint(buffer, offset)
+            stacks.append(stack)
+
+        moves_count, offset = decode_varint(buffer, offset)
+        stack_indices = array('q')
+        items_removed = array('q')
+        for _ in range(moves_count):
+            stack_index, offset = decode_varint(buffer, offset)
+            items, offset = decode_varint(buffer, offset)
+            stack_indices.append(stack_index)
+            items_removed.append(items)
+
+        stats = None
+        if flags & FLAG_STATS:
+            stats = []
+            for _ in range(moves_count):
+                values = {}
+                for name, kind in self._stats_fields:
+                    if kind == 'f':
+                        value = FLOAT.unpack_from(buffer, offset)[0]
+                        offset += FLOAT.size
+                    else:
+                        value, offset = decode_varint(buffer, offset)
+                    # Fields this version does not know are skipped
+                    if name in self._known_fields:
+                        values[name] = value
+                stats.append(SearchStats(**values))
+
+        return GameRecord(
+            first_player=first_player,
+            second_player=second_player,
+            stacks=stacks,
+            stack_indices=stack_indices,
+            items_removed=items_removed,
+            first_player_won=bool(flags & FLAG_FIRST_PLAYER_WON) if flags & FLAG_FINISHED else None,
+            stats=stats)
@@ -1,19 +1,24 @@
-from Algorithms.AlgorithmBase import AlgorithmBase, Move
+from Algorithms.AlgorithmBase import AlgorithmBase, Move, SearchStats
+from Algorithms.GameState import GameState
 
 
 class NimMisere:
-    def __init__(self, stacks: list[int], first_player: AlgorithmBase, second_player: AlgorithmBase):
-        self.stacks: list[int] = stacks
+    def __init__(self, stacks: GameState | list[int], first_player: AlgorithmBase, second_player: AlgorithmBase):
+        self.state: GameState = stacks if isinstance(stacks, GameState) else GameState(stacks)
         self.first_player: AlgorithmBase = first_player
         self.second_player: AlgorithmBase = second_player
         
         self.first_player_turn: bool = True
+        # In timed moves, let the waiting player search on the opponent's time
+        self.pondering: bool = False
+        # Stats of the algorithm that made the last move
+        self.last_stats: SearchStats | None = None
         
     def get_result(self) -> bool | None:
         """
         Returns True if the first player wins, False if the second player wins, and None if the game is still in progress.
         """
-        if all(stack == 0 for stack in self.stacks):
+        if self.state.is_terminal():
             return self.first_player_turn
         return None
     
@@ -30,12 +35,11 @@ class NimMisere:
         if self.get_result() is not None:
             return
         
-        if self.first_player_turn:
-            move = self.first_player.get_move(self.stacks, depth)
-        else:
-            move = self.second_player.get_move(self.stacks, depth)
+        player = self.first_player if self.first_player_turn else self.second_player
+        move = player.get_move(self.state, depth)
+        self.last_stats = player.stats
 
-        self.stacks[move.stack_index] -= move.items_to_remove
+        self.state = self.state.after(move.stack_index, move.items_to_remove)
         self.first_player_turn = not self.first_player_turn
 
         return move
@@ -44,12 +48,19 @@ class NimMisere:
         if self.get_result() is not None:
             return
         
-        if self.first_player_turn:
-            move = self.first_player.get_move_timed(self.stacks, time_in_seconds)
-        else:
-            move = self.second_player.get_move_timed(self.stacks, time_in_seconds)
+        player = self.first_player if self.first_player_turn else self.second_player
+        waiting_player = self.second_player if self.first_player_turn else self.first_player
+        ponder = self.pondering and waiting_player is not player
+        if ponder:
+            waiting_player.start_pondering(self.state)
+        try:
+            move = player.get_move_timed(self.state, time_in_seconds)
+        finally:
+            if ponder:
+                waiting_player.stop_pondering()
+        self.last_stats = player.stats
 
-        self.stacks[move.stack_index] -= move.items_to_remove
+        self.state = self.state.after(move.stack_index, move.items_to_remove)
         self.first_player_turn = not self.first_player_turn
 
         return move
@@ -1,14 +1,15 @@
+import os
+
 from textual import on
 from textual.app import ComposeResult
 from textual.screen import Screen
 from textual.widgets import Button, Header, Footer, Input, Select, Label
 from textual.containers import Container
+from textual.validation import Number
 
-from Algorithms.AlgorithmBase import AlgorithmBase
 from Algorithms.Random import Random
-from Algorithms.Mcts import MctsAlgorithm
-from Algorithms.AlphaBeta import AlphaBetaAlgorithm
 from Algorithms.Optimal import Optimal
+from Algorithms.Registry import ALGORITHMS
 
 from NimMisere import NimMisere
 from Ui.RunGameScreen.RunGameScreen import RunGameScreen
@@ -51,6 +52,12 @@ class ConfigureGameScreen(Screen):
         content-align: center middle;
     }
     
+    #workers_label {
+        height: 3;
+        width: 100%;
+        content-align: center middle;
+    }
+    
     #start_button {
         height: 3;
         width: 100%;
@@ -65,21 +72,15 @@ class ConfigureGameScreen(Screen):
     
     def __init__(self):
         super().__init__()
-        self.select_1 = Select(options=[
-            (Random.get_name(), Random),
-            (MctsAlgorithm.get_name(), MctsAlgorithm),
-            (AlphaBetaAlgorithm.get_name(), AlphaBetaAlgorithm),
-            (Optimal.get_name(), Optimal)], 
+        self.select_1 = Select(options=[(algorithm.get_name(), algorithm) for algorithm in ALGORITHMS], 
             classes="algorithm_select", 
             value=Optimal)
-        self.select_2 = Select(options=[
-            (Random.get_name(), Random),
-            (MctsAlgorithm.get_name(), MctsAlgorithm),
-            (AlphaBetaAlgorithm.get_name(), AlphaBetaAlgorithm),
-            (Optimal.get_name(), Optimal)], 
+        self.select_2 = Select(options=[(algorithm.get_name(), algorithm) for algorithm in ALGORITHMS], 
             classes="algorithm_select", 
             value=Random)
         self.stack_sizes_input = Input(value="1,2,3,4", placeholder="Stack size", id="stack_size_input")
+        self.workers_input = Input(value=str(os.cpu_count() or 1), placeholder="Worker processes", id="workers_input",
+                                   validators=Number(minimum=1))
     
     def compose(self) -> ComposeResult:
         yield Header()
@@ -95,6 +96,8 @@ class ConfigureGameScreen(Screen):
         
         yield Label("Choose stack sizes (as comma separated values)", id="stack_sizes_label")
         yield self.stack_sizes_input
+        yield Label("Worker processes of parallel algorithms", id="workers_label")
+        yield self.workers_input
         yield Button("Start", id="start_button", variant="success")
         yield Footer()
         
@@ -127,5 +130,14 @@ class ConfigureGameScreen(Screen):
             self.app.notify("Second algorithm is not chosen", severity="error")
             return
         
-        game = NimMisere(stack_sizes, self.select_1.value(), self.select_2.value())
+        if not self.workers_input.validate(self.workers_input.value).is_valid:
+            self.app.notify("Worker processes must be a positive integer", severity="error")
+            return
+        
+        players = [self.select_1.value(), self.select_2.value()]
+        for player in players:
+            if hasattr(player, "workers"):
+                player.workers = int(float(self.workers_input.value))
+        
+        game = NimMisere(stack_sizes, players[0], players[1])
         self.app.push_screen(RunGameScreen(game))
@@ -1,3 +1,5 @@
+import threading
+
 from textual import on, work
 from textual.app import ComposeResult
 from textual.screen import Screen
@@ -5,6 +7,7 @@ from textual.widgets import Button, Header, Footer, Label, Input
 from textual.containers import ScrollableContainer, Container
 from textual.validation import Number
 
+from Algorithms.AlgorithmBase import CancellationToken, SearchCancelled, SearchProgress
 from NimMisere import NimMisere
 from GameHistory import GameHistory
 from Ui.RunGameScreen.GameOverModal import GameOverModal
@@ -60,6 +63,10 @@ class RunGameScreen(Screen):
         width: 1fr;
     }
     
+    #pondering_button {
+        width: 1fr;
+    }
+    
     #button_container {
         layout: horizontal;
         width: 100%;
@@ -87,12 +94,24 @@ class RunGameScreen(Screen):
     def __init__(self, game: NimMisere):
         super().__init__()
         self.history: GameHistory = GameHistory(game)
-        self.previous_stacks: list[int] = game.stacks.copy()
+        self.previous_stacks: list[int] = list(game.state)
         self.stack_labels = [Label(f"Stack {i+1}: {size}", classes="stack_label") 
-                             for i, size in enumerate(self.history.game.stacks)]
+                             for i, size in enumerate(self.history.game.state)]
         self.limit_input = Input(value="1", placeholder="Depth", id="limit_input", validators=Number(minimum=0.01))
         self.change_limit_type_button = Button("Depth", id="limit_type_button", variant="primary")
+        self.pondering_button = Button("Pondering: Off", id="pondering_button", variant="default")
         self.running_worker = None
+        # Whether a game step is running, guarded by the lock - the UI thread and the worker decide under it
+        # which of them closes the players, so they are closed once the last one is done with them
+        self._worker_lock = threading.Lock()
+        self._worker_running = False
+        self._players_closed = False
+
+        # Cancelled on exit, so a search still running does not keep the CPU busy
+        self.cancellation_token = CancellationToken()
+        for player in (game.first_player, game.second_player):
+            player.cancellation_token = self.cancellation_token
+            player.progress_callback = self._on_progress
     
     def _get_whose_turn_label_text(self) -> str:
         algorithm_name = self.history.game.get_current_player_name()
@@ -105,6 +124,7 @@ class RunGameScreen(Screen):
         yield Container(
             self.change_limit_type_button,
             self.limit_input,
+            self.pondering_button,
             id="params_container"
         )
         yield Container(
@@ -130,11 +150,34 @@ class RunGameScreen(Screen):
         
     @on(Button.Pressed, "#exit_button")
     def exit(self, event: Button.Pressed) -> None:
+        self.cancellation_token.cancel()
         if self.running_worker is not None:
             self.running_worker.cancel()
             self.running_worker = None
+        with self._worker_lock:
+            # A running worker closes the players once the search stops
+            close = not self._worker_running
+        if close:
+            self._close_players()
 
         self.dismiss()
+
+    def _close_players(self) -> None:
+        with self._worker_lock:
+            if self._players_closed:
+                return
+            self._players_closed = True
+        self.history.game.first_player.close()
+        self.history.game.second_player.close()
+
+    def _on_progress(self, progress: SearchProgress) -> None:
+        """Called from the worker thread while an algorithm searches"""
+        text = (f"{self._get_whose_turn_label_text()} - thinking {progress.elapsed:.1f} s, depth {progress.depth}, "
+                f"{progress.nodes} nodes, {progress.iterations} iterations")
+        if progress.best_move is not None:
+            text += (f", best so far: take {progress.best_move.items_to_remove} "
+                     f"from stack {progress.best_move.stack_index + 1}")
+        self.app.call_from_thread(self.query_one("#whose_turn_label").update, text)
         
     @on(Button.Pressed, "#next_move_button")
     def next_move(self, event: Button.Pressed) -> None:
@@ -150,8 +193,35 @@ class RunGameScreen(Screen):
         self.limit_input.placeholder = "Depth" if self.change_limit_type_button.label == "Depth" else "Time Limit"
         self.limit_input.value = "" 
 
+    @on(Button.Pressed, "#pondering_button")
+    def toggle_pondering(self, event: Button.Pressed) -> None:
+        # Pondering only happens in timed moves
+        self.history.game.pondering = not self.history.game.pondering
+        self.pondering_button.label = "Pondering: On" if self.history.game.pondering else "Pondering: Off"
+        self.pondering_button.variant = "success" if self.history.game.pondering else "default"
+
     @work(thread=True, exclusive=True)
     def _run_game_step_and_update_ui(self) -> None:
+        with self._worker_lock:
+            if self._players_closed:
+                # The screen was closed before the worker started
+                return
+            self._worker_running = True
+        try:
+            self._game_step_and_update_ui()
+        except SearchCancelled:
+            # The screen was closed during the search
+            pass
+        finally:
+            self.running_worker = None
+            with self._worker_lock:
+                self._worker_running = False
+                # Nothing searches after the game is over or the screen is closed
+                close = self.cancellation_token.is_cancelled() or self.history.game.get_result() is not None
+            if close:
+                self._close_players()
+
+    def _game_step_and_update_ui(self) -> None:
         if self.change_limit_type_button.label == "Depth":
             self.history.step(int(float(self.limit_input.value)))
         else:
@@ -165,13 +235,15 @@ class RunGameScreen(Screen):
             else:
                 label.remove_class("last_updated")
                 
-        self.previous_stacks = self.history.get_stacks()
+        self.previous_stacks = current_stacks
             
         async def handle_game_over():
             await self.app.push_screen_wait(GameOverModal(self.history.game))
             self.dismiss() 
             
         if self.history.game.get_result() is not None:
+            # The worker waits until the result is dismissed, the players are not needed anymore
+            self._close_players()
             self.app.call_from_thread(handle_game_over)
             return
         
@@ -181,7 +253,6 @@ class RunGameScreen(Screen):
             self.query_one("#whose_turn_label").update(self._get_whose_turn_label_text())
         
         self.app.call_from_thread(do_ui_stuff)
-        self.running_worker = None
         
     def _step_back_and_update_ui(self) -> None:
         self.history.step_back()